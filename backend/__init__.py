@@ -18,7 +18,14 @@ from dal.data.shared.vault import JWT_SECRET_KEY
 from gd_node.protocols.http.middleware import JWTMiddleware
 
 from backend import http
+from backend.core.catalog import CATALOG_SCOPES, ApplicationCatalog
+from backend.core.log_query import HISTOGRAM_CACHE_SIZE, HISTOGRAM_CACHE_TTL
 from backend.core.log_streaming.log_streamer import LogStreamer
+from backend.core.loop_monitor import LoopLagMonitor
+from backend.core.query_cache import QueryCache
+from backend.core.async_dal import AsyncDAL
+from backend.core.scope_feed import ScopeChangeFeed
+from backend.core.var_subscriber import VarSubscriptionHub
 from backend.endpoints.static import StaticApp
 from backend.endpoints import auth, ws, static
 from backend.endpoints.api import v1, v2
@@ -47,6 +54,41 @@ async def log_streamer(app: web.Application):
     streamer.stop()
 
 
+async def loop_monitor(app: web.Application):
+    """
+    This function is made for context handling by aiohttp.
+    It will start sampling the event loop lag at startup and will stop
+    at shutdown.
+
+    Args:
+        app (web.Application): The main application
+    """
+    monitor = LoopLagMonitor()
+    app["loop_monitor"] = monitor
+    monitor.start()
+
+    yield
+
+    monitor.stop()
+
+
+async def var_subscriptions(app: web.Application):
+    """
+    This function is made for context handling by aiohttp.
+    It creates the Var subscription hub, its keyspace listener starts with
+    the first subscriber, and stops it at shutdown.
+
+    Args:
+        app (web.Application): The main application
+    """
+    hub = VarSubscriptionHub(AsyncDAL(app["executor"]))
+    app["var_hub"] = hub
+
+    yield
+
+    hub.stop()
+
+
 async def root(_: web.Request) -> web.Response:
     """web app root"""
     package_fs = "launcher"  # mov-fe-app-launcher
@@ -79,8 +121,15 @@ def main():
     # APIs and other applications are added as sub applications
     main_app = web.Application()
     main_app["executor"] = ThreadPoolExecutor(max_workers=10)
+    main_app["scope_feed"] = ScopeChangeFeed()
+    main_app["app_catalog"] = ApplicationCatalog()
+    main_app["query_cache"] = QueryCache()
+    main_app["histogram_cache"] = QueryCache(HISTOGRAM_CACHE_TTL, HISTOGRAM_CACHE_SIZE)
+    main_app["scope_feed"].add_listener(main_app["app_catalog"].invalidate, CATALOG_SCOPES)
     main_app.on_response_prepare.append(on_prepare)
+    main_app.cleanup_ctx.append(loop_monitor)
     main_app.cleanup_ctx.append(log_streamer)
+    main_app.cleanup_ctx.append(var_subscriptions)
 
     # prepare JWT middleware
     jwt_mw = JWTMiddleware(JWT_SECRET_KEY)
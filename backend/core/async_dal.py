@@ -0,0 +1,109 @@
+"""
+   Copyright (C) Mov.ai  - All Rights Reserved
+   Unauthorized copying of this file, via any medium is strictly prohibited
+   Proprietary and confidential
+
+   Usage:
+        Async adapter for the data access layer, the blocking calls to
+        Var and the scope classes are run on an executor so they
+        don't stall the event loop.
+"""
+import asyncio
+import functools
+from concurrent.futures import Executor
+from typing import Any, Callable
+
+from dal.models.var import Var
+
+
+class AsyncProxy:
+    """Wraps a blocking object, calling one of its methods returns an
+    awaitable which runs the method on the executor.
+    """
+
+    def __init__(self, obj: Any, dal: "AsyncDAL") -> None:
+        """Initializes the object.
+
+        Args:
+            obj (Any): the blocking object to wrap.
+            dal (AsyncDAL): the adapter used to run the calls.
+        """
+        self._obj = obj
+        self._dal = dal
+
+    async def setattr(self, name: str, value: Any) -> None:
+        """Sets an attribute which may be stored to the database.
+
+        Args:
+            name (str): the name of the attribute.
+            value (Any): the value to set.
+        """
+        await self._dal.run(setattr, self._obj, name, value)
+
+    def __getattr__(self, name: str) -> Callable:
+        attr = getattr(self._obj, name)
+        if not callable(attr):
+            raise AttributeError(f"{name} is not a method")
+
+        async def call(*args, **kwargs):
+            return await self._dal.run(attr, *args, **kwargs)
+
+        return call
+
+
+class AsyncDAL:
+    """Runs the data access layer calls on an executor."""
+
+    def __init__(self, executor: Executor = None) -> None:
+        """Initializes the object.
+
+        Args:
+            executor (Executor, optional): the executor to run the blocking
+                calls on, the loop default executor if None.
+        """
+        self._executor = executor
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Runs a blocking function on the executor.
+
+        Args:
+            func (Callable): The function to run.
+
+        Returns:
+            Any: The return value of the function.
+        """
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def wrap(self, obj: Any) -> AsyncProxy:
+        """Wraps an already created blocking object.
+
+        Args:
+            obj (Any): the object to wrap.
+
+        Returns:
+            AsyncProxy: the wrapped object.
+        """
+        return AsyncProxy(obj, self)
+
+    async def var(self, scope: str, **kwargs) -> AsyncProxy:
+        """Creates a Var object.
+
+        Args:
+            scope (str): the Var scope.
+
+        Returns:
+            AsyncProxy: the wrapped Var object.
+        """
+        return self.wrap(await self.run(Var, scope, **kwargs))
+
+    async def scope(self, scope_class: type, *args, **kwargs) -> AsyncProxy:
+        """Creates (loads) an object of a scope class.
+
+        Args:
+            scope_class (type): the scope class.
+
+        Returns:
+            AsyncProxy: the wrapped scope object.
+        """
+        return self.wrap(await self.run(scope_class, *args, **kwargs))
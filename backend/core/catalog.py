@@ -0,0 +1,134 @@
+"""
+   Copyright (C) Mov.ai  - All Rights Reserved
+   Unauthorized copying of this file, via any medium is strictly prohibited
+   Proprietary and confidential
+
+   Usage:
+        Keeps a precomputed catalog of the applications and the
+        permissions served on every page load.
+"""
+import asyncio
+import time
+from typing import List, Optional
+
+from movai_core_shared.logger import Log
+
+from dal.models.acl import NewACLManager
+from dal.scopes.application import Application
+
+from backend.core.async_dal import AsyncDAL
+
+CATALOG_TTL = 60  # seconds
+CATALOG_SCOPES = ("Application", "Role")
+
+
+class ApplicationCatalog:
+    """Caches the permissions catalog and the applications list.
+
+    The cache is invalidated whenever an Application or a Role changes
+    through the API, the TTL covers changes done by other processes.
+    """
+
+    def __init__(self, ttl: float = CATALOG_TTL) -> None:
+        """Initializes the object.
+
+        Args:
+            ttl (float, optional): seconds the catalog is valid for.
+        """
+        self._logger = Log.get_logger(self.__class__.__name__)
+        self._ttl = ttl
+        self._catalog: Optional[dict] = None
+        self._built_at = 0.0
+        self._version = 0
+        self._building: Optional[asyncio.Future] = None
+        self._building_version = 0
+
+    def invalidate(self, event: dict = None) -> None:
+        """Drops the cached catalog, can be used as a scope change listener.
+
+        Args:
+            event (dict, optional): the scope change event.
+        """
+        self._version += 1
+        self._catalog = None
+        if event is not None:
+            self._logger.debug(f"catalog invalidated by {event['scope']}:{event['name']}")
+
+    @staticmethod
+    def _build() -> dict:
+        """Builds the catalog, this is blocking thus needs to be run on an
+        executor.
+
+        Returns:
+            dict: the permissions and the applications.
+        """
+        permissions = NewACLManager.get_permissions()
+        enabled = set(permissions.get("Applications", []))
+
+        applications = []
+        apps: List[Application] = Application.get_model_objects()
+        for app in apps:
+            applications.append(
+                {
+                    "URL": app.Package if app.Type == "application" else app.EntryPoint,
+                    "Label": app.Label,
+                    "Icon": app.Icon,
+                    "Enabled": app.name in enabled,
+                    "Type": app.Type,
+                }
+            )
+        return {"permissions": permissions, "applications": applications}
+
+    async def get(self, dal: AsyncDAL) -> dict:
+        """Returns the catalog, rebuilding it if expired. Concurrent callers
+        share the same build, unless it started before an invalidation.
+
+        Args:
+            dal (AsyncDAL): the adapter used to run the build.
+
+        Returns:
+            dict: the permissions and the applications.
+        """
+        if self._catalog is not None and time.monotonic() - self._built_at < self._ttl:
+            return self._catalog
+
+        if self._building is None or self._building_version != self._version:
+            # a build started before an invalidation may miss the change
+            self._building = asyncio.ensure_future(self._rebuild(dal, self._version))
+            self._building_version = self._version
+        building = self._building
+        try:
+            return await asyncio.shield(building)
+        finally:
+            if self._building is building and building.done():
+                self._building = None
+
+    async def _rebuild(self, dal: AsyncDAL, version: int) -> dict:
+        catalog = await dal.run(self._build)
+        # do not keep a catalog built before an invalidation
+        if version == self._version:
+            self._catalog = catalog
+            self._built_at = time.monotonic()
+        return catalog
+
+    async def get_permissions(self, dal: AsyncDAL) -> dict:
+        """Returns the permissions catalog.
+
+        Args:
+            dal (AsyncDAL): the adapter used to run the build.
+
+        Returns:
+            dict: the permissions of every resource.
+        """
+        return (await self.get(dal))["permissions"]
+
+    async def get_applications(self, dal: AsyncDAL) -> List[dict]:
+        """Returns the applications list.
+
+        Args:
+            dal (AsyncDAL): the adapter used to run the build.
+
+        Returns:
+            List[dict]: the applications in the client format.
+        """
+        return (await self.get(dal))["applications"]
@@ -0,0 +1,411 @@
+"""
+   Copyright (C) Mov.ai  - All Rights Reserved
+   Unauthorized copying of this file, via any medium is strictly prohibited
+   Proprietary and confidential
+
+   Usage:
+        Queries the logs stored by the message-server through LogsQuery.
+
+        The dates of a query are passed to LogsQuery as fromDate and toDate,
+        the same params the live log stream filters by, from and to (or
+        from_ and to_) are accepted as aliases.
+
+        The export walks the logs from the newest to the oldest with a
+        time plus id cursor instead of an offset, every page is a query
+        bounded by toDate thus deep pages cost the same as the first one.
+        The id of a log is a digest of its content, so logs sharing the
+        same time have a stable order.
+
+        A query of several robots is split into a query per robot, run
+        concurrently, and the results are merged by time.
+
+        The histogram counts the logs per time bucket and level while
+        streaming through the export pages, the closed buckets are cached.
+        LogsQuery has no aggregation, so the first histogram of a range
+        costs as much as exporting its logs.
+"""
+import asyncio
+import base64
+import csv
+import hashlib
+import heapq
+import io
+import itertools
+import json
+import math
+import time
+from collections import Counter
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import unquote
+
+from movai_core_shared.logger import Log, LogsQuery
+
+from backend.core.query_cache import QueryCache
+
+LOGGER = Log.get_logger(__name__)
+
+LOG_TIME_FIELD = "time"
+# the resolution of the log times, the to date is exclusive thus a page
+# ends this long after the cursor time to include the logs sharing it
+LOG_TIME_STEP = 1e-6  # seconds
+# the date params of a query, the first one is the name used by LogsQuery
+FROM_DATE_PARAMS = ("fromDate", "from", "from_")
+TO_DATE_PARAMS = ("toDate", "to", "to_")
+CURSOR_FIELD = "cursor"
+EXPORT_PAGE_SIZE = 1000
+MAX_EXPORT_PAGE_SIZE = 64000
+NDJSON_FORMAT = "ndjson"
+CSV_FORMAT = "csv"
+EXPORT_FORMATS = {NDJSON_FORMAT: "application/x-ndjson", CSV_FORMAT: "text/csv"}
+# the params handled by the export itself
+EXPORT_PARAMS = ("limit", "offset", "cursor", "format")
+LOG_LEVEL_FIELD = "level"
+MAX_HISTOGRAM_BUCKETS = 10000
+# logs may arrive late, a bucket is cached once it ended this long ago
+HISTOGRAM_GRACE = 60  # seconds
+HISTOGRAM_BUCKET = 60  # seconds
+HISTOGRAM_CACHE_TTL = 3600  # seconds
+HISTOGRAM_CACHE_SIZE = 10000  # buckets
+
+MAX_ROBOT_QUERIES = 8  # concurrent queries of a multi robot query
+# every robot is queried for offset + limit logs, deeper pages are exported
+MAX_ROBOT_QUERY_DEPTH = 10000
+LOGS_LIMIT = 1000
+LOGS_TOTAL_FIELD = "size"  # the number of logs matching a paginated query
+
+Cursor = Tuple[float, str]
+
+
+def get_date_range(params: dict) -> Tuple[Optional[str], Optional[str]]:
+    """Returns the from and to dates of the params, whichever alias is used.
+
+    Args:
+        params (dict): the request params.
+
+    Returns:
+        Tuple[Optional[str], Optional[str]]: the from and to dates, None if missing.
+    """
+    from_ = next((params[key] for key in FROM_DATE_PARAMS if params.get(key) is not None), None)
+    to = next((params[key] for key in TO_DATE_PARAMS if params.get(key) is not None), None)
+    return from_, to
+
+
+def set_date_range(params: dict, from_=None, to=None) -> dict:
+    """Returns a copy of the params with the date range under the LogsQuery
+    names, the aliases are removed.
+
+    Args:
+        params (dict): the request params.
+        from_ (optional): the start of the range, unbounded if None.
+        to (optional): the end of the range, unbounded if None.
+
+    Returns:
+        dict: the LogsQuery params.
+    """
+    result = {
+        key: val
+        for key, val in params.items()
+        if key not in FROM_DATE_PARAMS and key not in TO_DATE_PARAMS
+    }
+    if from_ is not None:
+        result[FROM_DATE_PARAMS[0]] = from_
+    if to is not None:
+        result[TO_DATE_PARAMS[0]] = to
+    return result
+
+
+def date_params(params: dict) -> dict:
+    """Returns a copy of the params with the date range under the LogsQuery names."""
+    return set_date_range(params, *get_date_range(params))
+
+
+async def fetch_logs(**params) -> List[dict]:
+    """Runs a single LogsQuery query.
+
+    Args:
+        params: the LogsQuery params.
+
+    Returns:
+        List[dict]: the logs.
+    """
+    output = await LogsQuery.get_logs(pagination=True, **params)
+    if isinstance(output, dict):
+        return output.get("data", [])
+    return output or []
+
+
+def split_robots(params: dict) -> List[str]:
+    """Returns the robots of the robots param.
+
+    Args:
+        params (dict): the request params.
+
+    Returns:
+        List[str]: the robot names.
+    """
+    robots = unquote(str(params.get("robots") or ""))
+    return list(dict.fromkeys(robot.strip() for robot in robots.split(",") if robot.strip()))
+
+
+def log_time(log: dict) -> float:
+    return log.get(LOG_TIME_FIELD) or 0
+
+
+async def get_logs_per_robot(params: dict, robots: List[str], concurrency: int = MAX_ROBOT_QUERIES):
+    """Runs the paginated LogsQuery query of several robots as a query per
+    robot, at most concurrency at once. The newest first results are merged
+    with a heap and the requested page is sliced from the merged stream.
+
+    Args:
+        params (dict): the LogsQuery params, with limit and offset.
+        robots (List[str]): the robots to query.
+        concurrency (int, optional): the number of concurrent queries.
+
+    Raises:
+        ValueError: in case the page is deeper than MAX_ROBOT_QUERY_DEPTH.
+
+    Returns:
+        the LogsQuery output with the merged page as data and the total
+        size of all the robots.
+    """
+    limit = int(params.get("limit", LOGS_LIMIT))
+    offset = int(params.get("offset", 0))
+    if offset + limit > MAX_ROBOT_QUERY_DEPTH:
+        raise ValueError(
+            f"offset + limit of several robots is limited to {MAX_ROBOT_QUERY_DEPTH}, "
+            "use /logs/export/ for deeper pages"
+        )
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def query(robot: str):
+        async with semaphore:
+            robot_params = dict(params, robots=robot, limit=offset + limit, offset=0)
+            return await LogsQuery.get_logs(pagination=True, **robot_params)
+
+    outputs = await asyncio.gather(*(query(robot) for robot in robots))
+    streams = []
+    for output in outputs:
+        logs = output.get("data", []) if isinstance(output, dict) else output or []
+        streams.append(sorted(logs, key=log_time, reverse=True))
+    merged = heapq.merge(*streams, key=log_time, reverse=True)
+    page = list(itertools.islice(merged, offset, offset + limit))
+
+    dicts = [output for output in outputs if isinstance(output, dict)]
+    if not dicts:
+        return page
+    result = dict(dicts[0], data=page)
+    if LOGS_TOTAL_FIELD in result:
+        result[LOGS_TOTAL_FIELD] = sum(output.get(LOGS_TOTAL_FIELD) or 0 for output in dicts)
+    # the robot queries echo their own limit and offset
+    for key, value in (("limit", limit), ("offset", offset)):
+        if key in result:
+            result[key] = value
+    return result
+
+
+def log_id(log: dict) -> str:
+    """Returns the id of a log, a digest of its content if it has none.
+
+    Args:
+        log (dict): the log.
+
+    Returns:
+        str: the id of the log.
+    """
+    if log.get("id") is not None:
+        return str(log["id"])
+    content = json.dumps(log, sort_keys=True, default=str).encode()
+    return hashlib.sha1(content).hexdigest()[:16]
+
+
+def log_position(log: dict) -> Cursor:
+    """Returns the position of a log in the export order."""
+    return (log.get(LOG_TIME_FIELD) or 0, log_id(log))
+
+
+def encode_cursor(position: Cursor) -> str:
+    """Encodes a position as an url safe cursor, without the base64
+    padding which is not supported by fetch_request_params.
+    """
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """Decodes a cursor returned by the export.
+
+    Args:
+        cursor (str): the cursor.
+
+    Raises:
+        ValueError: in case the cursor is not valid.
+
+    Returns:
+        Cursor: the time and id of the last exported log.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        log_time, log_id_ = json.loads(base64.urlsafe_b64decode(padded))
+        return (log_time, str(log_id_))
+    except (TypeError, ValueError) as error:
+        raise ValueError(f"invalid cursor: {cursor}") from error
+
+
+async def export_logs(
+    params: dict, cursor: Optional[str] = None, page_size: int = EXPORT_PAGE_SIZE
+) -> AsyncIterator[List[dict]]:
+    """Yields the logs matching the params page by page, from the newest to
+    the oldest. Every log has a "cursor" field, passing it back resumes the
+    export after that log.
+
+    Args:
+        params (dict): the LogsQuery params, the to date bounds the newest log.
+        cursor (str, optional): the cursor of the last log received.
+        page_size (int, optional): the number of logs queried at once.
+
+    Raises:
+        ValueError: in case the cursor is not valid.
+
+    Yields:
+        List[dict]: the next page of logs.
+    """
+    params = date_params({key: val for key, val in params.items() if key not in EXPORT_PARAMS})
+    from_, _ = get_date_range(params)
+    position = decode_cursor(cursor) if cursor else None
+    limit = page_size
+    while True:
+        query = dict(params, limit=limit, offset=0)
+        if position is not None:
+            # the logs at the cursor time which follow the cursor are kept
+            # by the position filter, the ones already sent are removed
+            query = set_date_range(query, from_, position[0] + LOG_TIME_STEP)
+        logs = await fetch_logs(**query)
+        full = len(logs) >= limit
+
+        page = sorted(((log_position(log), log) for log in logs), key=lambda item: item[0])
+        page.reverse()
+        if position is not None:
+            page = [item for item in page if item[0] < position]
+
+        if full:
+            # the limit may split the logs of the oldest time of the page,
+            # they are queried whole with the next page
+            oldest = page[-1][0][0] if page else None
+            complete = [item for item in page if item[0][0] != oldest]
+            if not complete:
+                if limit >= MAX_EXPORT_PAGE_SIZE:
+                    raise ValueError(f"too many logs at the same time to export after {position}")
+                limit = min(limit * 2, MAX_EXPORT_PAGE_SIZE)
+                continue
+            page = complete
+
+        if not page:
+            return
+        for log_pos, log in page:
+            log[CURSOR_FIELD] = encode_cursor(log_pos)
+        yield [log for _, log in page]
+
+        position = page[-1][0]
+        limit = page_size
+        if not full:
+            return
+
+
+def format_ndjson(logs: List[dict]) -> bytes:
+    """Encodes logs as NDJSON lines."""
+    return "".join(json.dumps(log, default=str) + "\n" for log in logs).encode()
+
+
+class CsvFormatter:
+    """Encodes pages of logs as CSV, the columns are the fields of the first
+    log with the cursor last.
+    """
+
+    def __init__(self) -> None:
+        self._fields = None
+
+    def __call__(self, logs: List[dict]) -> bytes:
+        output = io.StringIO()
+        if self._fields is None and logs:
+            self._fields = [field for field in logs[0] if field != CURSOR_FIELD] + [CURSOR_FIELD]
+            csv.writer(output).writerow(self._fields)
+        writer = csv.DictWriter(output, self._fields or [], extrasaction="ignore")
+        writer.writerows(logs)
+        return output.getvalue().encode()
+
+
+async def log_histogram(
+    params: dict, from_: float, to: float, bucket: float, cache: QueryCache
+) -> List[dict]:
+    """Counts the logs matching the params per bucket and level. The buckets
+    are aligned to multiples of the bucket duration, the ones which ended
+    HISTOGRAM_GRACE seconds ago and are fully inside the range are cached,
+    only the range of the missing buckets is queried. The logs of that
+    range are fetched and counted here, as LogsQuery can not count them.
+
+    Args:
+        params (dict): the LogsQuery filter params.
+        from_ (float): the start time of the range.
+        to (float): the end time of the range, excluded.
+        bucket (float): the bucket duration.
+        cache (QueryCache): the cache of the closed buckets.
+
+    Raises:
+        ValueError: in case the range holds too many buckets.
+
+    Returns:
+        List[dict]: a {"start", "counts", "total"} dict per bucket.
+    """
+    params = set_date_range({key: val for key, val in params.items() if key != "bucket"})
+    first = from_ - from_ % bucket
+    # the buckets are indexed by integers, adding up float durations would
+    # drift away from the start computed for a log time
+    size = math.ceil((to - first) / bucket)
+    if size > MAX_HISTOGRAM_BUCKETS:
+        raise ValueError(f"the range holds more than {MAX_HISTOGRAM_BUCKETS} buckets")
+    starts = [first + index * bucket for index in range(size)]
+
+    filter_key = QueryCache.make_key("histogram", params)
+    closed_before = time.time() - HISTOGRAM_GRACE
+
+    def cacheable(index: int) -> bool:
+        start = starts[index]
+        return start >= from_ and start + bucket <= min(to, closed_before)
+
+    counts: Dict[int, Counter] = {}
+    for index in range(size):
+        if cacheable(index):
+            cached = cache.lookup((filter_key, bucket, starts[index]))
+            if cached is not None:
+                counts[index] = Counter(cached)
+
+    # the consecutive missing buckets are queried together
+    runs: List[List[int]] = []
+    for index in range(size):
+        if index in counts:
+            continue
+        if runs and runs[-1][-1] + 1 == index:
+            runs[-1].append(index)
+        else:
+            runs.append([index])
+
+    for run in runs:
+        query_from, query_to = max(starts[run[0]], from_), min(starts[run[-1]] + bucket, to)
+        counted = {index: Counter() for index in run}
+        query = set_date_range(params, query_from, query_to)
+        async for logs in export_logs(query):
+            for log in logs:
+                log_time = log.get(LOG_TIME_FIELD)
+                if log_time is None or not query_from <= log_time < query_to:
+                    continue
+                index = int((log_time - first) // bucket)
+                if index in counted:
+                    counted[index][log.get(LOG_LEVEL_FIELD)] += 1
+        for index, bucket_counts in counted.items():
+            counts[index] = bucket_counts
+            if cacheable(index):
+                cache.store((filter_key, bucket, starts[index]), dict(bucket_counts))
+
+    return [
+        {"start": start, "counts": dict(counts[index]), "total": sum(counts[index].values())}
+        for index, start in enumerate(starts)
+    ]
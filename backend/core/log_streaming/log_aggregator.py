@@ -0,0 +1,72 @@
+"""
+   Copyright (C) Mov.ai  - All Rights Reserved
+   Unauthorized copying of this file, via any medium is strictly prohibited
+   Proprietary and confidential
+
+   Usage:
+        Counts the live log messages per (robot, service, level) in fixed
+        time buckets, the snapshots sent to the clients depend on the
+        number of tags seen and not on the log volume.
+"""
+import time
+from collections import Counter, OrderedDict
+from typing import Tuple
+
+from backend.core.log_streaming.log_record import LogRecord
+
+CountKey = Tuple[str, str, str]
+
+
+class LogAggregator:
+    """Rolling counters of log messages by the time they were received."""
+
+    def __init__(self, bucket: float, window: int) -> None:
+        """Initializes the object.
+
+        Args:
+            bucket (float): the duration of a bucket in seconds.
+            window (int): the number of buckets kept, including the current one.
+        """
+        self._bucket = bucket
+        self._window = window
+        self._buckets: "OrderedDict[float, Counter]" = OrderedDict()
+
+    def _bucket_start(self, timestamp: float) -> float:
+        return timestamp - timestamp % self._bucket
+
+    def add(self, record: LogRecord) -> None:
+        """Counts a log message in the current bucket.
+
+        Args:
+            record (LogRecord): the log message.
+        """
+        start = self._bucket_start(time.time())
+        counts = self._buckets.get(start)
+        if counts is None:
+            counts = self._buckets[start] = Counter()
+            self._expire(start)
+        tags = record.request.req_data.log_tags
+        counts[(tags.robot, tags.service, tags.level)] += 1
+
+    def _expire(self, current: float) -> None:
+        oldest = current - (self._window - 1) * self._bucket
+        while self._buckets and next(iter(self._buckets)) < oldest:
+            self._buckets.popitem(last=False)
+
+    def snapshot(self) -> dict:
+        """Returns the counters of the buckets in the window.
+
+        Returns:
+            dict: the stats event, every bucket has its start time and
+                a [robot, service, level, count] row per tags seen.
+        """
+        self._expire(self._bucket_start(time.time()))
+        return {
+            "event": "stats",
+            "bucket": self._bucket,
+            "time": time.time(),
+            "buckets": [
+                {"start": start, "counts": [[*key, count] for key, count in counts.items()]}
+                for start, counts in self._buckets.items()
+            ],
+        }
@@ -10,17 +10,107 @@
    - Erez Zomer (erez@mov.ai) - 2023
 """
 import asyncio
+import json
+import os
+import sys
+import time
 import uuid
+from collections import deque
 from logging import Logger
+from typing import Callable, List, Optional, Tuple, Union
 
 from aiohttp import WSMsgType, web
 from movai_core_shared.logger import Log
-from movai_core_shared.messages.log_data import LogRequest
 
+from backend.core.log_streaming.log_aggregator import LogAggregator
 from backend.core.log_streaming.log_filter import LogFilter
+from backend.core.log_streaming.log_record import (
+    JSON_FORMAT,
+    LOG_FORMATS,
+    MSGPACK,
+    MSGPACK_FORMAT,
+    LogRecord,
+    pack,
+    pack_array_header,
+)
 from backend.helpers.rest_helpers import fetch_request_params
 
-QUEUE_SIZE = 100000
+BUFFER_SIZE = 1000
+MAX_BUFFER_SIZE = 10000
+MIN_BUFFER_SIZE = 10  # the buffer size is not downgraded below it
+DROP_OLDEST = "drop-oldest"
+DROP_NEWEST = "drop-newest"
+SAMPLE = "sample"
+OVERFLOW_POLICIES = (DROP_OLDEST, DROP_NEWEST, SAMPLE)
+SAMPLE_RATE = 10  # with the sample policy 1 of every SAMPLE_RATE overflowing msgs is kept
+BATCH_MS = 100  # default flush interval when only batch_size is requested
+MAX_BATCH_SIZE = 1000
+MAX_BATCH_MS = 5000
+STREAM_MODE = "stream"
+AGGREGATE_MODE = "aggregate"
+STATS_BUCKET = 60  # seconds
+STATS_WINDOW = 5  # buckets
+STATS_CADENCE = 5  # seconds
+MAX_STATS_BUCKET = 3600
+MAX_STATS_WINDOW = 60
+# a ping is sent every HEARTBEAT seconds, the socket is closed when the
+# pong does not arrive within half of it
+HEARTBEAT = float(os.getenv("LOG_CLIENT_HEARTBEAT", "30"))
+# a peer not accepting a frame for SEND_TIMEOUT seconds is evicted
+SEND_TIMEOUT = float(os.getenv("LOG_CLIENT_SEND_TIMEOUT", "10"))
+
+
+def int_param(params: dict, name: str, default: int, minimum: int, maximum: int) -> int:
+    """Reads an int request param and clamps it to the allowed range.
+
+    Args:
+        params (dict): the request params.
+        name (str): the name of the param.
+        default (int): the value if the param is missing.
+        minimum (int): the lowest allowed value.
+        maximum (int): the highest allowed value.
+
+    Raises:
+        web.HTTPBadRequest: in case the param is not an int.
+
+    Returns:
+        int: the value of the param.
+    """
+    try:
+        value = int(params.get(name, default))
+    except ValueError as error:
+        raise web.HTTPBadRequest(reason=f"{name} must be an int") from error
+    return max(minimum, min(value, maximum))
+
+
+def bool_param(params: dict, name: str, default: bool) -> bool:
+    """Reads a boolean request param.
+
+    Args:
+        params (dict): the request params.
+        name (str): the name of the param.
+        default (bool): the value if the param is missing.
+
+    Returns:
+        bool: the value of the param.
+    """
+    if name not in params:
+        return default
+    return str(params[name]).lower() not in ("0", "false", "no", "off")
+
+
+class ControlEvent:
+    """A buffered control event, the overflow policy skips it."""
+
+    __slots__ = ("entry",)
+
+    def __init__(self, entry: Union[str, tuple]) -> None:
+        self.entry = entry
+
+
+def entry_size(entry: Union[str, tuple]) -> int:
+    """The size of a buffered frame, text frames are counted in characters."""
+    return len(entry[0]) if isinstance(entry, tuple) else len(entry)
 
 
 class LogClient:
@@ -32,7 +122,35 @@ class LogClient:
         self._sock = None
         self._filter = None
         self._ws = None
-        self._queue = asyncio.Queue(QUEUE_SIZE)
+        self._buffer = deque()
+        self._buffered_bytes = 0
+        self._buffered_events = 0
+        self._buffer_size = BUFFER_SIZE
+        self._downgrades = 0
+        self._overflow = DROP_OLDEST
+        self._overflow_count = 0
+        self._ready = asyncio.Event()
+        self._closed = asyncio.Event()
+        self._dropped = 0
+        self._unreported_drops = 0
+        self._batch_size = 1
+        self._batch_ms = 0
+        self._compress = True
+        self._format = JSON_FORMAT
+        self._known_names = set()
+        self._backfill = 0
+        self._resume_from = None
+        self._aggregator: Optional[LogAggregator] = None
+        self._cadence = STATS_CADENCE
+        self._created = time.time()
+        self._remote = None
+        self._received = 0
+        self._delivered = 0
+        self._frames_sent = 0
+        self._bytes_sent = 0
+        self._last_send = None
+        self._transport = None
+        self._filter_handler: Optional[Callable[["LogClient", LogFilter], None]] = None
 
     @property
     def id(self) -> uuid.UUID:
@@ -42,6 +160,122 @@ class LogClient:
     def socket(self) -> web.WebSocketResponse:
         return self._sock
 
+    @property
+    def filter(self) -> LogFilter:
+        return self._filter
+
+    def set_filter(self, log_filter: LogFilter):
+        """Sets the client filter, when registered in a LogStreamer the
+        filter is replaced through LogStreamer.update_client_filter.
+
+        Args:
+            log_filter (LogFilter): The new filter.
+        """
+        self._filter = log_filter
+
+    def set_filter_handler(self, handler: Callable[["LogClient", LogFilter], None]):
+        """Sets the function called to replace the filter on a client request.
+
+        Args:
+            handler (Callable[[LogClient, LogFilter], None]): the function.
+        """
+        self._filter_handler = handler
+
+    @property
+    def buffer_size(self) -> int:
+        return self._buffer_size
+
+    @property
+    def buffered(self) -> int:
+        """The number of frames waiting to be sent."""
+        return len(self._buffer)
+
+    @property
+    def buffered_bytes(self) -> int:
+        """The size of the frames waiting to be sent, text frames are
+        counted in characters.
+        """
+        return self._buffered_bytes
+
+    @property
+    def backfill(self) -> int:
+        """The number of recent messages requested before the live ones."""
+        return self._backfill
+
+    @property
+    def resume_from(self) -> Optional[int]:
+        """The sequence number of the last message received before reconnecting."""
+        return self._resume_from
+
+    @property
+    def dropped(self) -> int:
+        """The number of messages dropped since the client connected."""
+        return self._dropped
+
+    def configure(self, params: dict):
+        """Configures the client from the request params.
+
+        Args:
+            params (dict): the request params, the filter params and:
+                buffer: the number of messages to keep for the client.
+                overflow: the policy when the buffer is full, one of
+                    drop-oldest (default), drop-newest or sample.
+                batch_size: send up to batch_size messages in a single
+                    array frame, 1 (default) sends a frame per message.
+                batch_ms: the time to wait for a batch to fill.
+                compress: false disables permessage-deflate.
+                format: json (default) or msgpack for binary frames.
+                backfill: the number of recent messages to send before the
+                    live ones, limited by the buffer size.
+                resume_from: the sequence number of the last message
+                    received, the messages after it are sent before the
+                    live ones if they are still retained.
+                mode: stream (default) sends the messages, aggregate sends
+                    the message counts per robot, service and level.
+                bucket: the aggregate bucket duration in seconds.
+                window: the number of aggregate buckets sent.
+                cadence: the seconds between aggregate snapshots.
+
+        Raises:
+            web.HTTPBadRequest: in case a param is not valid.
+        """
+        overflow = params.get("overflow", DROP_OLDEST)
+        if overflow not in OVERFLOW_POLICIES:
+            raise web.HTTPBadRequest(
+                reason=f"overflow must be one of {', '.join(OVERFLOW_POLICIES)}"
+            )
+        self._overflow = overflow
+        self._buffer_size = int_param(params, "buffer", BUFFER_SIZE, 1, MAX_BUFFER_SIZE)
+        batch_ms = int_param(params, "batch_ms", 0, 0, MAX_BATCH_MS)
+        default_size = MAX_BATCH_SIZE if batch_ms else 1
+        self._batch_size = int_param(params, "batch_size", default_size, 1, MAX_BATCH_SIZE)
+        if self._batch_size > 1 and not batch_ms:
+            batch_ms = BATCH_MS
+        self._batch_ms = batch_ms
+        self._compress = bool_param(params, "compress", True)
+        log_format = params.get("format", JSON_FORMAT)
+        if log_format not in LOG_FORMATS:
+            raise web.HTTPBadRequest(reason=f"format must be one of {', '.join(LOG_FORMATS)}")
+        if log_format == MSGPACK_FORMAT and not MSGPACK:
+            raise web.HTTPBadRequest(reason="The msgpack format is not supported")
+        self._format = log_format
+        self._backfill = int_param(params, "backfill", 0, 0, self._buffer_size)
+        if params.get("resume_from") not in (None, ""):
+            self._resume_from = int_param(params, "resume_from", 0, 0, sys.maxsize)
+        mode = params.get("mode", STREAM_MODE)
+        if mode not in (STREAM_MODE, AGGREGATE_MODE):
+            raise web.HTTPBadRequest(reason=f"mode must be {STREAM_MODE} or {AGGREGATE_MODE}")
+        if mode == AGGREGATE_MODE:
+            bucket = int_param(params, "bucket", STATS_BUCKET, 1, MAX_STATS_BUCKET)
+            window = int_param(params, "window", STATS_WINDOW, 1, MAX_STATS_WINDOW)
+            self._cadence = int_param(params, "cadence", STATS_CADENCE, 1, MAX_STATS_BUCKET)
+            self._aggregator = LogAggregator(bucket, window)
+            self._backfill, self._resume_from = 0, None
+        try:
+            self._filter = LogFilter(**params)
+        except ValueError as error:
+            raise web.HTTPBadRequest(reason=str(error)) from error
+
     async def prepare_socket(self, request: web.Request):
         """prepares the socket
 
@@ -54,7 +288,8 @@ class LogClient:
         Returns:
             web.WebSocketResponse: The websocket reponse object.
         """
-        ws = web.WebSocketResponse()
+        # permessage-deflate is used when the client offers it
+        ws = web.WebSocketResponse(compress=self._compress, heartbeat=HEARTBEAT or None)
         if ws.can_prepare(request):
             await ws.prepare(request)
             self._ws = ws
@@ -64,50 +299,305 @@ class LogClient:
             self._logger.warning(error_msg)
             raise web.HTTPError(error_msg)
 
-    async def push(self, request: LogRequest):
-        """Push a message to client's queue.
+    def push(self, record: LogRecord):
+        """Push a message which passed the client filter to client's buffer,
+        never blocks. When the buffer is full the overflow policy decides
+        which message is dropped. Only the encoded frame is kept, it is
+        shared with the other clients.
 
         Args:
-            request (LogRequest): The LogRequest from the message-server.
+            record (LogRecord): The log message from the message-server.
         """
-        if self._filter.filter_msg(request):
-            await self._queue.put(request)
+        self._received += 1
+        if self._aggregator is not None:
+            self._aggregator.add(record)
+            return
+        if len(self._buffer) >= self._buffer_size:
+            self._overflow_count += 1
+            if self._overflow == DROP_NEWEST or (
+                self._overflow == SAMPLE and self._overflow_count % SAMPLE_RATE
+            ):
+                self._count_drop()
+                return
+            if not self._drop_oldest():
+                # the buffer is full of control events
+                self._count_drop()
+                return
+        if self._format == MSGPACK_FORMAT:
+            self._append_entry(record.packed())
+        else:
+            self._append_entry(record.frame())
+        self._ready.set()
 
-    async def send_msg(self, request: LogRequest):
-        """Sends a log message to the client by the client format.
+    def push_event(self, event: dict):
+        """Adds a control event to the client's buffer, it is sent in order
+        with the messages and is never dropped by the overflow policy.
 
         Args:
-            request (LogRequest): The LogRequest from the message-server.
+            event (dict): The event to send.
+        """
+        frame = self._encode_event(event)
+        entry = (frame, ()) if self._format == MSGPACK_FORMAT else frame
+        self._buffer.append(ControlEvent(entry))
+        self._buffered_bytes += entry_size(entry)
+        self._buffered_events += 1
+        self._ready.set()
+
+    def _append_entry(self, entry: Union[str, tuple]):
+        self._buffer.append(entry)
+        self._buffered_bytes += entry_size(entry)
+
+    def _pop_entry(self) -> Union[str, tuple]:
+        entry = self._buffer.popleft()
+        if isinstance(entry, ControlEvent):
+            self._buffered_events -= 1
+            entry = entry.entry
+        self._buffered_bytes -= entry_size(entry)
+        return entry
+
+    def _drop_oldest(self) -> bool:
+        """Drops the oldest log message, the control events are kept.
+
+        Returns:
+            bool: False if the buffer holds control events only.
+        """
+        if not self._buffered_events:
+            self._pop_entry()
+            self._count_drop()
+            return True
+        for index, entry in enumerate(self._buffer):
+            if not isinstance(entry, ControlEvent):
+                del self._buffer[index]
+                self._buffered_bytes -= entry_size(entry)
+                self._count_drop()
+                return True
+        return False
+
+    def downgrade(self) -> int:
+        """Halves the buffer size, or the number of buffered frames when it
+        is lower, down to MIN_BUFFER_SIZE and drops the oldest frames which
+        no longer fit. Used by the LogStreamer when the
+        buffers of all the clients exceed the memory budget, a downgraded
+        event tells the client its new buffer size.
+
+        Returns:
+            int: the number of bytes freed.
+        """
+        size = min(self._buffer_size, len(self._buffer)) // 2
+        if size < MIN_BUFFER_SIZE:
+            return 0
+        before = self._buffered_bytes
+        self._buffer_size = size
+        # leaves room for the downgraded event
+        while len(self._buffer) >= self._buffer_size and self._drop_oldest():
+            pass
+        self._downgrades += 1
+        self.push_event({"event": "downgraded", "buffer": self._buffer_size})
+        return max(before - self._buffered_bytes, 0)
+
+    def evict(self, reason: str):
+        """Closes the connection of a dead or stalled peer without the
+        closing handshake, which the peer would not complete.
+
+        Args:
+            reason (str): the reason logged.
+        """
+        if self._closed.is_set():
+            return
+        self._logger.warning(f"evicting log client {self._id} ({self._remote}): {reason}")
+        self._closed.set()
+        self._ready.set()
+        if self._transport is not None:
+            self._transport.abort()
+
+    def _count_drop(self):
+        self._dropped += 1
+        self._unreported_drops += 1
+
+    async def send_msg(self, frame: Union[str, bytes], messages: int = 0):
+        """Sends an encoded log message to the client.
+
+        Args:
+            frame (Union[str, bytes]): The message encoded in the client format.
+            messages (int, optional): The number of log messages in the frame,
+                counted as delivered once sent, control events hold none.
         """
         self._validate_socket()
         try:
-            log_msg = request.get_client_log_format()
-            await self._ws.send_json(log_msg)
+            if isinstance(frame, bytes):
+                send = self._ws.send_bytes(frame)
+            else:
+                send = self._ws.send_str(frame)
+            # a peer which stopped reading blocks the send once the
+            # transport buffer is full
+            await asyncio.wait_for(send, SEND_TIMEOUT)
+            self._frames_sent += 1
+            self._delivered += messages
+            # text frames are counted in characters
+            self._bytes_sent += len(frame)
+            self._last_send = time.time()
+        except asyncio.TimeoutError:
+            self.evict(f"no frame was accepted for {SEND_TIMEOUT}s")
+        except ConnectionError as err:
+            self.evict(str(err))
         except (ValueError, RuntimeError, TypeError) as err:
-            self.logger.error(err.__str__())
+            self._logger.error(err.__str__())
+
+    def _encode_event(self, event: dict) -> Union[str, bytes]:
+        if self._format == MSGPACK_FORMAT:
+            return pack(event)
+        return json.dumps(event)
+
+    async def send_event(self, event: dict):
+        """Sends a control event to the client in the client format.
+
+        Args:
+            event (dict): The event to send.
+        """
+        await self.send_msg(self._encode_event(event))
+
+    async def send_dropped(self):
+        """Reports the client the number of messages dropped since the last report."""
+        dropped, self._unreported_drops = self._unreported_drops, 0
+        await self.send_event({"event": "dropped", "count": dropped, "total": self._dropped})
+
+    async def _fill_batch(self):
+        """Waits until the buffer holds a full batch or batch_ms elapsed."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._batch_ms / 1000
+        while len(self._buffer) < self._batch_size and self.is_alive():
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+
+    def _pop_frames(self, count: int) -> List[Tuple[Union[str, bytes], int]]:
+        """Pops up to count messages from the buffer. For msgpack a names
+        frame precedes the first message using a name unknown to the client.
+
+        Args:
+            count (int): the maximal number of messages to pop.
+
+        Returns:
+            List[Tuple[Union[str, bytes], int]]: the frames to send, each with
+                the number of log messages it holds.
+        """
+        count = min(len(self._buffer), count)
+        frames = []
+        for _ in range(count):
+            messages = 0 if isinstance(self._buffer[0], ControlEvent) else 1
+            if self._format != MSGPACK_FORMAT:
+                frames.append((self._pop_entry(), messages))
+                continue
+            frame, names = self._pop_entry()
+            new_names = {
+                name_id: name for name_id, name in names if name_id not in self._known_names
+            }
+            if new_names:
+                self._known_names.update(new_names)
+                # msgpack decoders reject integer map keys by default
+                names_map = {str(name_id): name for name_id, name in new_names.items()}
+                frames.append((pack({"event": "names", "names": names_map}), 0))
+            frames.append((frame, messages))
+        return frames
+
+    def _join(self, frames: list) -> Union[str, bytes]:
+        """Joins encoded frames into a single array frame."""
+        if self._format == MSGPACK_FORMAT:
+            return pack_array_header(len(frames)) + b"".join(frames)
+        return "[" + ",".join(frames) + "]"
+
+    async def stream_stats(self):
+        """Sends the aggregate snapshot every cadence seconds, runs as long
+        as the websocket is not closed.
+        """
+        while self.is_alive():
+            await self.send_event(self._aggregator.snapshot())
+            try:
+                await asyncio.wait_for(self._closed.wait(), self._cadence)
+            except asyncio.TimeoutError:
+                pass
 
     async def stream_msgs(self):
-        """Pops requests from the queue and sends them to the client in a loop.
+        """Pops frames from the buffer and sends them to the client in a loop.
         runs as long as the websocket is not closed.
         """
         while self.is_alive():
-            msg = await self._queue.get()
-            await self.send_msg(msg)
+            if not self._buffer:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            if self._batch_size > 1:
+                await self._fill_batch()
+            if self._unreported_drops:
+                await self.send_dropped()
+            if not self.is_alive():
+                break
+            frames = self._pop_frames(self._batch_size)
+            if self._batch_size > 1:
+                await self.send_msg(
+                    self._join([frame for frame, _ in frames]),
+                    sum(messages for _, messages in frames),
+                )
+            else:
+                for frame, messages in frames:
+                    if not self.is_alive():
+                        # evicted by a failed send
+                        break
+                    await self.send_msg(frame, messages)
+
+    def handle_control_msg(self, data: str):
+        """Handles a JSON control message from the client:
+            {"action": "filter", "filter": {"levels": "ERROR", "robots": ["robot1"]}}
+        replaces the client filter, the filter params are the same as the
+        request params. A filter event acknowledges the change, the messages
+        after it passed the new filter.
+
+        Args:
+            data (str): The message from the client.
+        """
+        try:
+            msg = json.loads(data)
+            if not isinstance(msg, dict) or msg.get("action") != "filter":
+                raise ValueError("unknown control message")
+            params = msg.get("filter") or {}
+            if not isinstance(params, dict):
+                raise ValueError("filter must be an object")
+            log_filter = LogFilter(**params)
+        except ValueError as error:
+            self.push_event({"event": "error", "error": str(error)})
+            return
+        if self._filter_handler is not None:
+            self._filter_handler(self, log_filter)
+        else:
+            self.set_filter(log_filter)
+        self.push_event({"event": "filter", "filter": params})
 
     async def listen_to_client_msgs(self):
         """listens for client msgs and repond if necessary."""
         self._validate_socket()
-        async for msg in self._ws:
-            if msg.type == WSMsgType.TEXT:
-                if msg.data == "close":
-                    self._logger.debug(
-                        "closing the websocket connection for client id: {self._id}"
+        try:
+            async for msg in self._ws:
+                if msg.type == WSMsgType.TEXT:
+                    if msg.data == "close":
+                        self._logger.debug(
+                            f"closing the websocket connection for client id: {self._id}"
+                        )
+                        await self._ws.close()
+                    elif msg.data.startswith("{"):
+                        self.handle_control_msg(msg.data)
+                elif msg.type == WSMsgType.ERROR:
+                    self._logger.error(
+                        f"WebSocket connection closed with exception: {self._ws.exception()}"
                     )
-                    await self._ws.close()
-            elif msg.type == WSMsgType.ERROR:
-                self._logger.error(
-                    f"WebSocket connection closed with exception: {self._ws.exception()}"
-                )
+        finally:
+            # wake up the stream loop so it can exit
+            self._closed.set()
+            self._ready.set()
 
     async def run(self, request: web.Request):
         """Runs the client object in oreder to stream logs from backed to client.
@@ -118,20 +608,52 @@ class LogClient:
         Returns:
              web.WebSocketResponse: The websocket reponse object.
         """
-        params = fetch_request_params(request)
-        self._filter = LogFilter(**params)
+        if self._filter is None:
+            self.configure(fetch_request_params(request))
+        self._remote = request.remote
+        self._transport = request.transport
         await self.prepare_socket(request)
         asyncio.create_task(self.listen_to_client_msgs())
-        await self.stream_msgs()
+        if self._aggregator is not None:
+            await self.stream_stats()
+        else:
+            await self.stream_msgs()
         return self._ws
 
+    def stats(self) -> dict:
+        """Returns the client statistics for the pipeline introspection.
+
+        Returns:
+            dict: the client configuration and counters.
+        """
+        now = time.time()
+        return {
+            "id": str(self._id),
+            "remote": self._remote,
+            "age": now - self._created,
+            "mode": AGGREGATE_MODE if self._aggregator is not None else STREAM_MODE,
+            "format": self._format,
+            "filter": self._filter.params if self._filter is not None else None,
+            "overflow": self._overflow,
+            "buffer_size": self._buffer_size,
+            "queued": len(self._buffer),
+            "queued_bytes": self._buffered_bytes,
+            "downgrades": self._downgrades,
+            "received": self._received,
+            "dropped": self._dropped,
+            "delivered": self._delivered,
+            "frames_sent": self._frames_sent,
+            "bytes_sent": self._bytes_sent,
+            "idle": now - (self._last_send or self._created),
+        }
+
     def is_alive(self) -> bool:
         """Checks if the socket is not closed.
 
         Returns:
             bool: True if open, False otherwise.
         """
-        if self._ws is None:
+        if self._ws is None or self._closed.is_set():
             return False
         return not self._ws.closed
 
@@ -143,6 +665,6 @@ class LogClient:
             ConnectionError: in case the socket is closed.
         """
         if self._ws is None:
-            raise TypeError("The websocket is not initialized for client {self._id}")
+            raise TypeError(f"The websocket is not initialized for client {self._id}")
         if not self.is_alive():
             raise ConnectionError(f"The websocket for client {self.id} is closed!")
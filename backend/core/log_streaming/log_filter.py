@@ -1,11 +1,18 @@
+import re
 from abc import ABC, abstractmethod
+from typing import Callable, List, Optional
 
 from movai_core_shared.messages.log_data import LogRequest
 
+Predicate = Callable[[LogRequest], bool]
+
 
 class ParamFilter(ABC):
     """An abstract base class for various types of filter."""
 
+    # the order in which the compiled predicates are evaluated, cheap first
+    cost = 0
+
     def __init__(self, name: str) -> None:
         """Ctor.
 
@@ -18,13 +25,25 @@ class ParamFilter(ABC):
         self._name = name
 
     @abstractmethod
-    def filter_msg(self, msg: LogRequest):
-        """Abstract function for derived classes.
+    def compile(self) -> Predicate:
+        """Abstract function for derived classes, compiles the filter into
+        a predicate, called once per filter.
+
+        Returns:
+            Predicate: a function which returns True if a msg passes the filter.
+        """
+        pass
+
+    def filter_msg(self, msg: LogRequest) -> bool:
+        """Checks if a log message passes the filter.
 
         Args:
             msg (LogRequest): The log msg to filter
+
+        Returns:
+            bool: True if log message can pass filter, False if not.
         """
-        pass
+        return self.compile()(msg)
 
     @property
     def name(self) -> str:
@@ -35,6 +54,24 @@ class ParamFilter(ABC):
         """
         return self._name
 
+    @property
+    def value(self):
+        """property of the filter value.
+
+        Returns:
+            The value of the filter.
+        """
+        return self._value
+
+    @property
+    def key(self) -> tuple:
+        """A hashable representation of the filter, equal filters have equal keys.
+
+        Returns:
+            tuple: The name and value of the filter.
+        """
+        return (self._name, self._value)
+
 
 class StrParam(ParamFilter):
     def __init__(self, name: str, value: str) -> None:
@@ -49,7 +86,7 @@ class StrParam(ParamFilter):
         self._value = value
 
 
-class IntParam(ParamFilter):
+class FloatParam(ParamFilter):
     def __init__(self, name: str, value) -> None:
         """Ctor.
 
@@ -57,12 +94,15 @@ class IntParam(ParamFilter):
             name (str): the name of the filter.
         """
         super().__init__(name)
-        if not isinstance(value, int):
-            raise ValueError("value must be an int")
-        self._value = value
+        try:
+            self._value = float(value)
+        except (TypeError, ValueError) as error:
+            raise ValueError(f"{name} must be a number") from error
 
 
 class ListParam(ParamFilter):
+    cost = 1
+
     def __init__(self, name: str, value) -> None:
         """Ctor.
 
@@ -71,149 +111,242 @@ class ListParam(ParamFilter):
         """
         super().__init__(name)
         if isinstance(value, str):
-            self._value = [val.strip() for val in value.split(",")]
-        elif isinstance(value, list):
-            self._value = value
+            value = value.split(",")
+        if not isinstance(value, (list, tuple, set, frozenset)):
+            raise ValueError("value must be a comma separated string or a list")
+        self._value = frozenset(str(val).strip() for val in value)
+
+
+class TagParam(ListParam):
+    """An include filter for a log tag."""
+
+    tag = None
+
+    def compile(self) -> Predicate:
+        values, tag = self._value, self.tag
+
+        def predicate(msg: LogRequest) -> bool:
+            return getattr(msg.req_data.log_tags, tag) in values
+
+        return predicate
 
 
-class RobotParam(ListParam):
+class ExcludeTagParam(TagParam):
+    """An exclude filter for a log tag."""
+
+    def compile(self) -> Predicate:
+        values, tag = self._value, self.tag
+
+        def predicate(msg: LogRequest) -> bool:
+            return getattr(msg.req_data.log_tags, tag) not in values
+
+        return predicate
+
+
+class RobotParam(TagParam):
     """A filter for robot name."""
 
-    def __init__(self, value) -> None:
-        """Ctor.
+    tag = "robot"
 
-        Args:
-            name (str): the name of the filter.
-        """
+    def __init__(self, value) -> None:
         super().__init__("robots", value)
 
-    def filter_msg(self, msg: LogRequest) -> bool:
-        """filters a log messge based on robot name.
 
-        Args:
-            msg (LogRequest): The log message to filter.
+class ServiceParam(TagParam):
+    """A filter for service name."""
 
-        Returns:
-            bool: True if log message can pass filter, False if not.
-        """
-        return msg.req_data.log_tags.robot in self._value
+    tag = "service"
 
+    def __init__(self, value) -> None:
+        super().__init__("services", value)
 
-class ServiceParam(ListParam):
-    """A filter for service name."""
+
+class LevelParam(TagParam):
+    """A filter for level type."""
+
+    tag = "level"
 
     def __init__(self, value) -> None:
-        """Ctor.
+        super().__init__("levels", value)
 
-        Args:
-            name (str): the name of the filter.
-        """
-        super().__init__("services", value)
 
-    def filter_msg(self, msg: LogRequest):
-        """filters a log messge based on service name.
+class ExcludeRobotParam(ExcludeTagParam):
+    """A filter dropping robot names."""
 
-        Args:
-            msg (LogRequest): The log message to filter.
+    tag = "robot"
 
-        Returns:
-            bool: True if log message can pass filter, False if not.
-        """
-        return msg.req_data.log_tags.service in self._value
+    def __init__(self, value) -> None:
+        super().__init__("exclude_robots", value)
 
 
-class LevelParam(ListParam):
-    """A filter for level type."""
+class ExcludeServiceParam(ExcludeTagParam):
+    """A filter dropping service names."""
+
+    tag = "service"
 
     def __init__(self, value) -> None:
-        """Ctor.
+        super().__init__("exclude_services", value)
 
-        Args:
-            name (str): the name of the filter.
-        """
-        super().__init__("levels", value)
 
-    def filter_msg(self, msg: LogRequest):
-        """filters a log messge based on level.
+class ExcludeLevelParam(ExcludeTagParam):
+    """A filter dropping levels."""
 
-        Args:
-            msg (LogRequest): The log message to filter.
+    tag = "level"
 
-        Returns:
-            bool: True if log message can pass filter, False if not.
-        """
-        return msg.req_data.log_tags.level in self._value
+    def __init__(self, value) -> None:
+        super().__init__("exclude_levels", value)
 
 
-class MessageParam(StrParam):
+class TagsParam(ListParam):
+    """A filter for any log tag, the value is a list of tag:value pairs,
+    a message passes if it matches all the pairs.
+    """
+
+    cost = 2
+
+    def __init__(self, value, name: str = "tags") -> None:
+        super().__init__(name, value)
+        pairs = []
+        for pair in self._value:
+            tag, sep, tag_value = pair.partition(":")
+            if not sep or not tag:
+                raise ValueError(f"{name} must be a list of tag:value")
+            pairs.append((tag.strip(), tag_value.strip()))
+        self._pairs = tuple(pairs)
+
+    def compile(self) -> Predicate:
+        pairs = self._pairs
+
+        def predicate(msg: LogRequest) -> bool:
+            tags = msg.req_data.log_tags
+            return all(str(getattr(tags, tag, None)) == value for tag, value in pairs)
+
+        return predicate
+
+
+class ExcludeTagsParam(TagsParam):
+    """A filter dropping messages matching any of the tag:value pairs."""
+
     def __init__(self, value) -> None:
-        """Ctor.
+        super().__init__(value, "exclude_tags")
 
-        Args:
-            name (str): the name of the filter.
-        """
+    def compile(self) -> Predicate:
+        pairs = self._pairs
+
+        def predicate(msg: LogRequest) -> bool:
+            tags = msg.req_data.log_tags
+            return not any(str(getattr(tags, tag, None)) == value for tag, value in pairs)
+
+        return predicate
+
+
+class MessageParam(StrParam):
+    """A filter for a substring of the message."""
+
+    cost = 3
+
+    def __init__(self, value) -> None:
         super().__init__("message", value)
 
-    def filter_msg(self, msg: LogRequest):
-        """filters a log messge based on message content.
+    def compile(self) -> Predicate:
+        value = self._value
 
-        Args:
-            msg (LogRequest): The log message to filter.
+        def predicate(msg: LogRequest) -> bool:
+            return value in msg.req_data.log_fields.message
 
-        Returns:
-            bool: True if log message can pass filter, False if not.
-        """
-        return msg.req_data.log_fields.message in self._value
+        return predicate
 
 
-class FromDateParam(int):
-    """A filter for issue time is later than specific value."""
+class MessageRegexParam(StrParam):
+    """A filter for a regular expression searched in the message."""
+
+    cost = 4
 
     def __init__(self, value) -> None:
-        """Ctor.
+        super().__init__("message_regex", value)
+        try:
+            self._regex = re.compile(value)
+        except re.error as error:
+            raise ValueError(f"message_regex is not valid: {error}") from error
 
-        Args:
-            name (str): the name of the filter.
-        """
+    def compile(self) -> Predicate:
+        search = self._regex.search
+
+        def predicate(msg: LogRequest) -> bool:
+            return search(msg.req_data.log_fields.message) is not None
+
+        return predicate
+
+
+class FromDateParam(FloatParam):
+    """A filter for issue time is later than specific value."""
+
+    cost = 1
+
+    def __init__(self, value) -> None:
         super().__init__("fromDate", value)
 
-    def filter_msg(self, msg: LogRequest):
-        """filters a log messge if issue time is later than filter value.
+    def compile(self) -> Predicate:
+        value = self._value
 
-        Args:
-            msg (LogRequest): The log message to filter.
+        def predicate(msg: LogRequest) -> bool:
+            return msg.created >= value
 
-        Returns:
-            bool: True if log message can pass filter, False if not.
-        """
-        return msg.created >= self._value
+        return predicate
 
 
-class ToDateParam(int):
+class ToDateParam(FloatParam):
     """A filter for issue time is before than a specific value."""
 
-    def __init__(self, value) -> None:
-        """Ctor.
+    cost = 1
 
-        Args:
-            name (str): the name of the filter.
-        """
+    def __init__(self, value) -> None:
         super().__init__("toDate", value)
 
-    def filter_msg(self, msg: LogRequest):
-        """filters a log messge if issue time is before filter value.
+    def compile(self) -> Predicate:
+        value = self._value
 
-        Args:
-            msg (LogRequest): The log message to filter.
+        def predicate(msg: LogRequest) -> bool:
+            return msg.created < value
+
+        return predicate
 
-        Returns:
-            bool: True if log message can pass filter, False if not.
-        """
-        return msg.created < self._value
+
+def _accept_all(msg: LogRequest) -> bool:
+    return True
+
+
+def compile_predicates(predicates: List[Predicate]) -> Predicate:
+    """Combines predicates into a single one.
+
+    Args:
+        predicates (List[Predicate]): the predicates, in evaluation order.
+
+    Returns:
+        Predicate: a function which returns True if a msg passes all of them.
+    """
+    if not predicates:
+        return _accept_all
+    if len(predicates) == 1:
+        return predicates[0]
+    if len(predicates) == 2:
+        first, second = predicates
+        return lambda msg: first(msg) and second(msg)
+    predicates = tuple(predicates)
+
+    def predicate(msg: LogRequest) -> bool:
+        for check in predicates:
+            if not check(msg):
+                return False
+        return True
+
+    return predicate
 
 
 class LogFilter:
-    """A class for filtering a log msg through several types of filters."""
+    """A class for filtering a log msg through several types of filters,
+    the filters are compiled once into a single predicate.
+    """
 
     _filters_types = {
         "robot": RobotParam,
@@ -222,17 +355,71 @@ class LogFilter:
         "services": ServiceParam,
         "level": LevelParam,
         "levels": LevelParam,
+        "exclude_robots": ExcludeRobotParam,
+        "exclude_services": ExcludeServiceParam,
+        "exclude_levels": ExcludeLevelParam,
+        "tags": TagsParam,
+        "exclude_tags": ExcludeTagsParam,
         "message": MessageParam,
+        "message_regex": MessageRegexParam,
+        "fromdate": FromDateParam,
+        "todate": ToDateParam,
     }
 
     def __init__(self, **params):
-        """Ctor"""
-        self._filters = []
+        """Ctor
+
+        Raises:
+            ValueError: in case a filter value is not valid.
+        """
+        self._filters: List[ParamFilter] = []
+        self._params = {}
         for filter_name, filter_val in params.items():
             filter_name = filter_name.lower()
-            if filter_name in self._filters_types and filter_val is not None:
+            if filter_name in self._filters_types and filter_val not in (None, ""):
                 filter = self._filters_types[filter_name](filter_val)
+                self._params[filter_name] = filter_val
                 self._filters.append(filter)
+        self._key = frozenset(filter.key for filter in self._filters)
+        self._filters.sort(key=lambda filter: filter.cost)
+        self._predicate = compile_predicates([filter.compile() for filter in self._filters])
+
+    @property
+    def params(self) -> dict:
+        """The params the filter was built from."""
+        return self._params
+
+    @property
+    def key(self) -> frozenset:
+        """A normalized representation of the filter, filters which pass
+        the same messages have equal keys.
+
+        Returns:
+            frozenset: The keys of the registered filters.
+        """
+        return self._key
+
+    def _allowed(self, name: str) -> Optional[frozenset]:
+        allowed = None
+        for filter in self._filters:
+            if filter.name == name:
+                allowed = filter.value if allowed is None else allowed & filter.value
+        return allowed
+
+    @property
+    def robots(self) -> Optional[frozenset]:
+        """The robots passing the filter, None if any robot passes."""
+        return self._allowed("robots")
+
+    @property
+    def services(self) -> Optional[frozenset]:
+        """The services passing the filter, None if any service passes."""
+        return self._allowed("services")
+
+    @property
+    def levels(self) -> Optional[frozenset]:
+        """The levels passing the filter, None if any level passes."""
+        return self._allowed("levels")
 
     def filter_msg(self, msg: LogRequest) -> bool:
         """Checks that a LogRequest msg can pass the registered filters.
@@ -243,7 +430,4 @@ class LogFilter:
         Returns:
             bool: True if can pass the filter, False otherwise.
         """
-        for filter in self._filters:
-            if not filter.filter_msg(msg):
-                return False
-        return True
+        return self._predicate(msg)
@@ -0,0 +1,142 @@
+"""
+   Copyright (C) Mov.ai  - All Rights Reserved
+   Unauthorized copying of this file, via any medium is strictly prohibited
+   Proprietary and confidential
+
+   Usage:
+        A log message received from the message-server, it is encoded
+        at most once per format and the encoded frame is shared by all
+        the clients.
+
+        The msgpack format is a fixed-schema array:
+            [created, level_code, robot_id, service_id, message, fields, seq]
+        where robot_id and service_id are ids from the process-wide name
+        table, the clients are sent a {"event": "names", "names": {id: name}}
+        frame before the first record using them, the ids are string keys
+        of the map, and fields holds the rest of the client log format.
+        The format needs the optional msgpack dependency, installed with
+        the backend[msgpack] extra.
+
+        Every record carries the sequence number given by the LogStreamer,
+        also added as "seq" to the JSON format.
+"""
+import json
+from typing import Dict, Tuple
+
+from movai_core_shared.messages.log_data import LogRequest
+
+try:
+    import msgpack
+
+    MSGPACK = True
+except ImportError:
+    MSGPACK = False
+
+JSON_FORMAT = "json"
+MSGPACK_FORMAT = "msgpack"
+LOG_FORMATS = (JSON_FORMAT, MSGPACK_FORMAT)
+LEVEL_CODES = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40, "CRITICAL": 50}
+COMPACT_FIELDS = ("robot", "service", "level", "message")
+
+_name_ids: Dict[str, int] = {}
+
+
+def intern_name(name: str) -> int:
+    """Returns the process-wide id of a robot or service name.
+
+    Args:
+        name (str): the name to intern.
+
+    Returns:
+        int: the id of the name.
+    """
+    name_id = _name_ids.get(name)
+    if name_id is None:
+        name_id = _name_ids[name] = len(_name_ids)
+    return name_id
+
+
+def pack(obj) -> bytes:
+    """Encodes an object with msgpack."""
+    return msgpack.packb(obj, use_bin_type=True, default=str)
+
+
+def pack_array_header(length: int) -> bytes:
+    """Returns the msgpack header of an array, followed by the packed items
+    it forms a packed array without re-encoding them.
+
+    Args:
+        length (int): the number of items in the array.
+
+    Returns:
+        bytes: the array header.
+    """
+    if length < 16:
+        return bytes((0x90 | length,))
+    if length < 0x10000:
+        return b"\xdc" + length.to_bytes(2, "big")
+    return b"\xdd" + length.to_bytes(4, "big")
+
+
+class LogRecord:
+    """Wraps a LogRequest and caches its client frames."""
+
+    __slots__ = ("request", "seq", "_frame", "_packed")
+
+    def __init__(self, request: LogRequest, seq: int = None) -> None:
+        """Initializes the object.
+
+        Args:
+            request (LogRequest): The LogRequest from the message-server.
+            seq (int, optional): The sequence number of the record.
+        """
+        self.request = request
+        self.seq = seq
+        self._frame = None
+        self._packed = None
+
+    def frame(self) -> str:
+        """Returns the message in the client log format encoded as JSON,
+        the encoding is done on the first call only.
+
+        Raises:
+            TypeError: in case the message can not be encoded.
+
+        Returns:
+            str: The encoded message.
+        """
+        if self._frame is None:
+            log_format = self.request.get_client_log_format()
+            if self.seq is not None:
+                log_format = {**log_format, "seq": self.seq}
+            self._frame = json.dumps(log_format)
+        return self._frame
+
+    def packed(self) -> Tuple[bytes, Tuple[Tuple[int, str], ...]]:
+        """Returns the message encoded in the msgpack format, the encoding
+        is done on the first call only.
+
+        Returns:
+            Tuple[bytes, Tuple[Tuple[int, str], ...]]: The encoded message
+                and the interned names it refers to.
+        """
+        if self._packed is None:
+            tags = self.request.req_data.log_tags
+            log_format = self.request.get_client_log_format()
+            fields = {key: val for key, val in log_format.items() if key not in COMPACT_FIELDS}
+            robot_id, service_id = intern_name(tags.robot), intern_name(tags.service)
+            level_code = LEVEL_CODES.get(str(tags.level).upper(), 0)
+            if not level_code:
+                fields["level"] = tags.level
+            record = [
+                self.request.created,
+                level_code,
+                robot_id,
+                service_id,
+                self.request.req_data.log_fields.message,
+                fields,
+                self.seq,
+            ]
+            names = ((robot_id, tags.robot), (service_id, tags.service))
+            self._packed = (pack(record), names)
+        return self._packed
@@ -11,7 +11,12 @@
 """
 import asyncio
 import logging
+import os
+import time
 import uuid
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
 
 from movai_core_shared.envvars import MESSAGE_SERVER_LOG_PUBLISHER_PORT
 from movai_core_shared.core.zmq.zmq_subscriber import AsyncZMQSubscriber
@@ -20,8 +25,48 @@ from movai_core_shared.logger import Log
 from movai_core_shared.messages.log_data import LogRequest
 
 from backend.core.log_streaming.log_client import LogClient
+from backend.core.log_streaming.log_filter import LogFilter
+from backend.core.log_streaming.log_record import LogRecord
+
+ZMQ_PUBLISHER_ADDR = os.getenv(
+    "LOG_STREAMER_ZMQ_ADDR", f"tcp://message-server:{MESSAGE_SERVER_LOG_PUBLISHER_PORT}"
+)
+RECENT_LOGS_SIZE = int(os.getenv("LOG_STREAMER_RECENT_LOGS", "10000"))
+ANY = None  # index entry of the groups which do not filter a tag
+INDEXED_TAGS = ("robot", "service", "level")
+RATE_INTERVAL = 1  # seconds the ingest rate is measured over
+# the bytes the buffers of all the clients may hold together
+MEMORY_BUDGET = int(os.getenv("LOG_STREAMER_MEMORY_BUDGET", str(256 * 1024 * 1024)))
+BUDGET_INTERVAL = 1  # seconds between the checks of the memory budget
+# the received messages are decoded in batches of up to DECODE_BATCH_SIZE on
+# a worker thread, at most PENDING_SIZE messages wait to be decoded
+DECODE_BATCH_SIZE = int(os.getenv("LOG_STREAMER_DECODE_BATCH", "256"))
+PENDING_SIZE = int(os.getenv("LOG_STREAMER_PENDING", "100000"))
+
+
+def initial_seq() -> int:
+    """The sequence number a LogStreamer starts from, the time in
+    microseconds keeps the sequence numbers increasing across restarts,
+    so stale resume points are detected.
+    """
+    return int(time.time() * 1_000_000)
+
+
+class ClientGroup:
+    """The clients sharing the same filter, a message is matched once
+    against the filter and pushed to all of them.
+    """
+
+    __slots__ = ("filter", "clients")
+
+    def __init__(self, log_filter: LogFilter) -> None:
+        self.filter = log_filter
+        self.clients: Dict[uuid.UUID, LogClient] = {}
+
+    def tag_values(self, tag: str) -> Optional[frozenset]:
+        """The values of a tag passing the group filter, None for any."""
+        return getattr(self.filter, f"{tag}s")
 
-ZMQ_PUBLISHER_ADDR = f"tcp://message-server:{MESSAGE_SERVER_LOG_PUBLISHER_PORT}"
 
 class LogStreamer:
     def __init__(self, debug: bool = False) -> None:
@@ -34,7 +79,29 @@ class LogStreamer:
         self._logger = logging.getLogger(self.__class__.__name__)
         self._subscriber: AsyncZMQSubscriber = ZMQManager.get_client(ZMQ_PUBLISHER_ADDR, ZMQType.ASYNC_SUBSCRIBER)
         self._clients = {}
+        self._groups: Dict[frozenset, ClientGroup] = {}
+        # tag -> tag value -> keys of the groups accepting it
+        self._index: Dict[str, Dict[Optional[str], Set[frozenset]]] = {
+            tag: defaultdict(set) for tag in INDEXED_TAGS
+        }
+        self._recent = deque(maxlen=RECENT_LOGS_SIZE)
+        self._seq = initial_seq()
         self._running = False
+        self._received = 0
+        self._handle_time = 0.0
+        self._max_handle_time = 0.0
+        self._rate = 0.0
+        self._rate_start = time.monotonic()
+        self._rate_count = 0
+        self._pending = deque(maxlen=PENDING_SIZE)
+        self._pending_ready = asyncio.Event()
+        self._decoder: Optional[ThreadPoolExecutor] = None
+        self._ingest_dropped = 0
+        self._decode_errors = 0
+        self._batches = 0
+        self._decoded = 0
+        self._decode_time = 0.0
+        self._max_decode_time = 0.0
 
     def is_client_registered(self, client_id: uuid.UUID) -> bool:
         """Checks if a client is registered.
@@ -60,9 +127,121 @@ class LogStreamer:
             )
             return client.id
         self._clients[client.id] = client
+        group = self._join_group(client)
+        if client.backfill or client.resume_from is not None:
+            self._replay(client, group)
         self._logger.debug(f"The client: {client.id} has been added to {self.__class__.__name__}")
         return client.id
 
+    def update_client_filter(self, client: LogClient, log_filter: LogFilter) -> None:
+        """Replaces the filter of a client, the client moves to the group of
+        the new filter at once thus the following messages are matched with
+        the new filter only.
+
+        Args:
+            client (LogClient): The client to update.
+            log_filter (LogFilter): The new filter.
+        """
+        if not self.is_client_registered(client.id):
+            client.set_filter(log_filter)
+            return
+        self._leave_group(client)
+        client.set_filter(log_filter)
+        self._join_group(client)
+        self._logger.debug(f"The filter of client: {client.id} was updated")
+
+    def _join_group(self, client: LogClient) -> ClientGroup:
+        key = client.filter.key
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = ClientGroup(client.filter)
+            self._index_group(key, group)
+        group.clients[client.id] = client
+        return group
+
+    def _leave_group(self, client: LogClient) -> None:
+        key = client.filter.key
+        group = self._groups.get(key)
+        if group is not None:
+            group.clients.pop(client.id, None)
+            if not group.clients:
+                self._index_group(key, group, add=False)
+                del self._groups[key]
+
+    def _replay(self, client: LogClient, group: ClientGroup) -> None:
+        """Pushes the retained records matching the client filter, filtered
+        locally, so the client gets them before the live messages.
+
+        A client resuming gets the records after its resume point, when
+        some are no longer retained (or more than its buffer can hold) a
+        gap event with the missing sequence numbers precedes them. Other
+        clients get the last backfill records.
+
+        Args:
+            client (LogClient): The newly registered client.
+            group (ClientGroup): The group of the client.
+        """
+        resume_from = client.resume_from
+        if resume_from is not None and resume_from > self._seq:
+            # the resume point is from a streamer which is gone
+            client.push_event({"event": "reset", "seq": self._seq})
+            resume_from = None
+
+        if resume_from is None:
+            limit = min(client.backfill, client.buffer_size - client.buffered)
+            records = [rec for rec in self._recent if group.filter.filter_msg(rec.request)]
+            records = records[-limit:] if limit > 0 else []
+        else:
+            records = [
+                rec
+                for rec in self._recent
+                if rec.seq > resume_from and group.filter.filter_msg(rec.request)
+            ]
+            # leaves room for the gap event
+            limit = max(client.buffer_size - client.buffered - 1, 0)
+            if len(records) > limit:
+                covered_from = records[-limit].seq if limit else self._seq + 1
+                records = records[-limit:] if limit else []
+            elif self._recent:
+                covered_from = self._recent[0].seq
+            else:
+                covered_from = self._seq + 1
+            if covered_from > resume_from + 1:
+                client.push_event({"event": "gap", "from": resume_from + 1, "to": covered_from - 1})
+
+        for record in records:
+            client.push(record)
+
+    def _index_group(self, key: frozenset, group: ClientGroup, add: bool = True) -> None:
+        for tag in INDEXED_TAGS:
+            index = self._index[tag]
+            for value in group.tag_values(tag) or (ANY,):
+                if add:
+                    index[value].add(key)
+                else:
+                    index[value].discard(key)
+                    if not index[value]:
+                        del index[value]
+
+    def _match_groups(self, log_msg: LogRequest) -> Set[frozenset]:
+        """Finds the groups which may accept a message by its indexed tags.
+
+        Args:
+            log_msg (LogRequest): The log message.
+
+        Returns:
+            Set[frozenset]: The keys of the candidate groups.
+        """
+        tags = log_msg.req_data.log_tags
+        candidates = None
+        for tag in INDEXED_TAGS:
+            index = self._index[tag]
+            keys = index.get(getattr(tags, tag), set()) | index.get(ANY, set())
+            candidates = keys if candidates is None else candidates & keys
+            if not candidates:
+                break
+        return candidates
+
     def unregister_client(self, client: LogClient) -> bool:
         """Unregister a client from the LogStreamer.
 
@@ -71,47 +250,189 @@ class LogStreamer:
         """
         if self.is_client_registered(client.id):
             self._clients.pop(client.id)
+            self._leave_group(client)
             self._logger.debug(f"The client: {client.id} was removed")
 
-    async def handle(self, request: dict) -> dict:
-        """Handles incoming messages.
+    def decode(self, request: dict) -> Optional[LogRequest]:
+        """Decodes and validates a message, thread safe.
 
         Args:
             request (dict): A request with logs.
 
         Returns:
-            dict: empty response
+            Optional[LogRequest]: the log message, None if not valid.
+        """
+        try:
+            return LogRequest(**request)
+        except Exception as error:
+            self._logger.error(str(error))
+            return None
+
+    def _decode_batch(self, batch: List[dict]) -> Tuple[List[Optional[LogRequest]], float]:
+        start = time.perf_counter()
+        decoded = [self.decode(request) for request in batch]
+        return decoded, time.perf_counter() - start
+
+    def dispatch(self, log_msg: LogRequest) -> None:
+        """Pushes a decoded message to the clients whose filter it passes.
+
+        Args:
+            log_msg (LogRequest): The log message.
         """
         clients_to_remove = set()
+        start = time.perf_counter()
         try:
-            log_msg = LogRequest(**request)
             if self._debug:
                 self._logger.debug(
                     f"{self.__class__.__name__}: {log_msg.req_data.log_fields.message}"
                 )
-            for client in self._clients.values():
-                if client.is_alive():
-                    await client.push(log_msg)
-                else:
-                    clients_to_remove.add(client)
+            self._seq += 1
+            record = LogRecord(log_msg, self._seq)
+            self._recent.append(record)
+            for key in self._match_groups(log_msg):
+                group = self._groups[key]
+                if not group.filter.filter_msg(log_msg):
+                    continue
+                for client in group.clients.values():
+                    if client.is_alive():
+                        client.push(record)
+                    else:
+                        clients_to_remove.add(client)
 
             for client in clients_to_remove:
                 self.unregister_client(client)
-
-            return {}
         except Exception as error:
             self._logger.error(str(error))
-            return {}
+        finally:
+            self._count_handled(start)
+
+    def _count_handled(self, start: float) -> None:
+        now = time.perf_counter()
+        elapsed = now - start
+        self._received += 1
+        self._handle_time += elapsed
+        self._max_handle_time = max(self._max_handle_time, elapsed)
+        self._rate_count += 1
+        interval = time.monotonic() - self._rate_start
+        if interval >= RATE_INTERVAL:
+            self._rate = self._rate_count / interval
+            self._rate_start += interval
+            self._rate_count = 0
+
+    def stats(self) -> dict:
+        """Returns the statistics of the log pipeline.
+
+        Returns:
+            dict: the ingest rate, the handling time per message and the
+                stats of every registered client.
+        """
+        interval = time.monotonic() - self._rate_start
+        rate = self._rate
+        if interval >= RATE_INTERVAL or self._rate_count == self._received:
+            # the current interval is over or is the first one
+            rate = self._rate_count / interval if interval > 0 else 0.0
+        return {
+            "received": self._received,
+            "rate": rate,
+            "pending": len(self._pending),
+            "ingest_dropped": self._ingest_dropped,
+            "decode_errors": self._decode_errors,
+            "decode": {
+                "batches": self._batches,
+                "avg_batch": self._decoded / self._batches if self._batches else 0.0,
+                "avg_ms": self._decode_time / self._decoded * 1000 if self._decoded else 0.0,
+                "max_batch_ms": self._max_decode_time * 1000,
+            },
+            "handle_ms": {
+                "avg": self._handle_time / self._received * 1000 if self._received else 0.0,
+                "max": self._max_handle_time * 1000,
+            },
+            "seq": self._seq,
+            "recent": len(self._recent),
+            "groups": len(self._groups),
+            "buffered_bytes": sum(client.buffered_bytes for client in self._clients.values()),
+            "memory_budget": MEMORY_BUDGET,
+            "clients": [client.stats() for client in self._clients.values()],
+        }
+
+    def enforce_budget(self) -> None:
+        """Downgrades the buffers of the clients while their total size is
+        above MEMORY_BUDGET. The slowest consumers, the ones holding the
+        most unsent bytes, are downgraded first.
+        """
+        total = sum(client.buffered_bytes for client in self._clients.values())
+        candidates = [client for client in self._clients.values() if client.buffered_bytes]
+        while total > MEMORY_BUDGET and candidates:
+            client = max(candidates, key=lambda client: client.buffered_bytes)
+            freed = client.downgrade()
+            if not freed:
+                candidates.remove(client)
+                continue
+            total -= freed
+            self._logger.warning(
+                f"The log streaming memory budget is exceeded, "
+                f"the buffer of client: {client.id} was downgraded to {client.buffer_size}"
+            )
+
+    async def watch_budget(self):
+        while self._running:
+            self.enforce_budget()
+            await asyncio.sleep(BUDGET_INTERVAL)
+
+    async def receive(self):
+        """Receives the messages from the message-server, they wait in the
+        pending queue until decoded, the oldest are dropped when it is full.
+        """
+        received = 0
+        while self._running:
+            request = await self._subscriber.recieve()
+            if len(self._pending) == self._pending.maxlen:
+                self._ingest_dropped += 1
+            self._pending.append(request)
+            self._pending_ready.set()
+            received += 1
+            if received % DECODE_BATCH_SIZE == 0:
+                # awaiting a message which already arrived does not yield
+                await asyncio.sleep(0)
 
     async def listen(self):
+        """Decodes the pending messages in batches on the decode thread, so
+        the validation of a log storm does not hold the event loop, and
+        dispatches the decoded batches to the clients.
+        """
+        loop = asyncio.get_running_loop()
         while self._running:
-            msg = await self._subscriber.recieve()
-            await self.handle(msg)
-            
+            if not self._pending:
+                self._pending_ready.clear()
+                await self._pending_ready.wait()
+                continue
+            count = min(len(self._pending), DECODE_BATCH_SIZE)
+            batch = [self._pending.popleft() for _ in range(count)]
+            decoded, elapsed = await loop.run_in_executor(self._decoder, self._decode_batch, batch)
+            self._batches += 1
+            self._decoded += count
+            self._decode_time += elapsed
+            self._max_decode_time = max(self._max_decode_time, elapsed)
+            for log_msg in decoded:
+                if log_msg is None:
+                    self._decode_errors += 1
+                else:
+                    self.dispatch(log_msg)
+
     def start(self):
         self._running = True
         self._logger.info("starting log streamer server!")
+        self._decoder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="log-decoder")
+        asyncio.create_task(self.receive())
         asyncio.create_task(self.listen())
+        asyncio.create_task(self.watch_budget())
 
     def stop(self):
+        self._recent = deque(maxlen=RECENT_LOGS_SIZE)
+        self._seq = initial_seq()
         self._running = False
+        self._pending.clear()
+        self._pending_ready.set()
+        if self._decoder is not None:
+            self._decoder.shutdown(wait=False)
+            self._decoder = None
@@ -0,0 +1,78 @@
+"""
+   Copyright (C) Mov.ai  - All Rights Reserved
+   Unauthorized copying of this file, via any medium is strictly prohibited
+   Proprietary and confidential
+
+   Usage:
+        Measures the event loop lag, the delay between the time a task
+        should have been woken up and the time it actually run.
+"""
+import asyncio
+import time
+from collections import deque
+
+from movai_core_shared.logger import Log
+
+SAMPLE_INTERVAL = 0.5  # seconds
+SAMPLES_WINDOW = 120
+LAG_WARNING = 0.25  # seconds
+
+
+class LoopLagMonitor:
+    """Samples the event loop lag periodically and keeps its statistics."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL, window: int = SAMPLES_WINDOW) -> None:
+        """Initializes the object.
+
+        Args:
+            interval (float, optional): seconds between samples.
+            window (int, optional): the number of recent samples to keep.
+        """
+        self._logger = Log.get_logger(self.__class__.__name__)
+        self._interval = interval
+        self._samples = deque(maxlen=window)
+        self._max_lag = 0.0
+        self._count = 0
+        self._started = None
+        self._task = None
+
+    async def _sample(self) -> None:
+        loop = asyncio.get_event_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self._interval)
+            lag = max(loop.time() - start - self._interval, 0.0)
+            self._samples.append(lag)
+            self._max_lag = max(self._max_lag, lag)
+            self._count += 1
+            if lag > LAG_WARNING:
+                self._logger.warning(f"event loop lag of {lag * 1000:.0f} ms")
+
+    def start(self) -> None:
+        self._started = time.time()
+        self._task = asyncio.create_task(self._sample())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        """Returns the lag statistics in milliseconds.
+
+        Returns:
+            dict: the lag statistics of the recent samples and since start.
+        """
+        samples = sorted(self._samples)
+        if not samples:
+            return {"samples": 0}
+        return {
+            "samples": self._count,
+            "interval_ms": self._interval * 1000,
+            "last_ms": self._samples[-1] * 1000,
+            "avg_ms": sum(samples) / len(samples) * 1000,
+            "p99_ms": samples[int(len(samples) * 0.99)] * 1000,
+            "window_max_ms": samples[-1] * 1000,
+            "max_ms": self._max_lag * 1000,
+            "uptime": time.time() - self._started,
+        }
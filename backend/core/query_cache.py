@@ -0,0 +1,145 @@
+"""
+   Copyright (C) Mov.ai  - All Rights Reserved
+   Unauthorized copying of this file, via any medium is strictly prohibited
+   Proprietary and confidential
+
+   Usage:
+        Caches the results of the log and metrics queries for a short
+        time, identical concurrent queries share a single upstream call.
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+from urllib.parse import unquote
+
+from movai_core_shared.logger import Log
+
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "5"))  # seconds
+QUERY_CACHE_SIZE = 256
+# the params holding comma separated sets, their order does not matter
+LIST_PARAMS = ("robot", "robots", "service", "services", "level", "levels", "tags")
+
+
+class QueryCache:
+    """A TTL cache of query results with single-flight coalescing."""
+
+    def __init__(self, ttl: float = QUERY_CACHE_TTL, max_entries: int = QUERY_CACHE_SIZE) -> None:
+        """Initializes the object.
+
+        Args:
+            ttl (float, optional): seconds a result is valid for.
+            max_entries (int, optional): the number of results kept.
+        """
+        self._logger = Log.get_logger(self.__class__.__name__)
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._results: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(query: str, params: dict) -> Hashable:
+        """Builds the cache key of a query from the request params, params
+        differing by escaping, spaces or the order of set values share a key.
+
+        Args:
+            query (str): the name of the query.
+            params (dict): the request params.
+
+        Returns:
+            Hashable: the cache key.
+        """
+        normalized = []
+        for name, value in params.items():
+            value = unquote(str(value)).strip()
+            if name in LIST_PARAMS:
+                value = ",".join(sorted({val.strip() for val in value.split(",") if val.strip()}))
+            normalized.append((name, value))
+        return (query, tuple(sorted(normalized)))
+
+    def lookup(self, key: Hashable) -> Any:
+        """Returns a cached result without running the query.
+
+        Args:
+            key (Hashable): the cache key.
+
+        Returns:
+            Any: the result, None if not cached or expired.
+        """
+        cached = self._results.get(key)
+        if cached is None:
+            return None
+        expires, result = cached
+        if time.monotonic() >= expires:
+            del self._results[key]
+            return None
+        self._results.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def stats(self) -> dict:
+        """Returns the number of cached results and running queries, and the
+        hits, misses and coalesced calls counted since the start.
+
+        Returns:
+            dict: the cache statistics.
+        """
+        return {
+            "entries": len(self._results),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
+
+    async def get(self, key: Hashable, query: Callable[[], Awaitable[Any]]) -> Any:
+        """Returns the cached result of a query, running it if expired.
+        Concurrent callers with the same key share the same run, a failed
+        run is not cached.
+
+        Args:
+            key (Hashable): the cache key, see make_key.
+            query (Callable[[], Awaitable[Any]]): runs the query.
+
+        Returns:
+            Any: the query result.
+        """
+        result = self.lookup(key)
+        if result is not None:
+            return result
+
+        running = self._inflight.get(key)
+        if running is not None:
+            self.coalesced += 1
+            return await asyncio.shield(running)
+
+        self.misses += 1
+        running = self._inflight[key] = asyncio.ensure_future(query())
+        # the run completes even if the callers are cancelled
+        running.add_done_callback(lambda future: self._on_done(key, future))
+        return await asyncio.shield(running)
+
+    def _on_done(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if future.cancelled() or future.exception() is not None:
+            return
+        self.store(key, future.result())
+
+    def store(self, key: Hashable, result: Any) -> None:
+        """Caches a result.
+
+        Args:
+            key (Hashable): the cache key.
+            result (Any): the result, None is not cached.
+        """
+        if result is None:
+            return
+        self._results[key] = (time.monotonic() + self._ttl, result)
+        self._results.move_to_end(key)
+        while len(self._results) > self._max_entries:
+            self._results.popitem(last=False)
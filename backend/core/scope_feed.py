@@ -0,0 +1,196 @@
+"""
+   Copyright (C) Mov.ai  - All Rights Reserved
+   Unauthorized copying of this file, via any medium is strictly prohibited
+   Proprietary and confidential
+
+   Usage:
+        Publishes the changes done on scopes through the REST API to
+        the subscribed clients.
+"""
+import asyncio
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from aiohttp import web
+
+from movai_core_shared.logger import Log
+
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+
+class ScopeSubscriber:
+    """A subscriber of the scope change feed, keeps the events matching
+    its filter until they are consumed.
+    """
+
+    def __init__(
+        self, scopes: Optional[Iterable[str]] = None, names: Optional[Iterable[str]] = None
+    ) -> None:
+        """Initializes the object.
+
+        Args:
+            scopes (Iterable[str], optional): the scopes to receive, all if empty.
+            names (Iterable[str], optional): the object names to receive, all if empty.
+        """
+        self._id = uuid.uuid4()
+        self._scopes = frozenset(scopes or ())
+        self._names = frozenset(names or ())
+        self._queue = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+        self._overflow = False
+        # the events queued before the first dropped one
+        self._before_overflow = 0
+
+    @property
+    def id(self) -> uuid.UUID:
+        return self._id
+
+    def match(self, event: dict) -> bool:
+        """Checks if the event passes the subscriber filter.
+
+        Args:
+            event (dict): the change event.
+
+        Returns:
+            bool: True if the event should be sent, False otherwise.
+        """
+        if self._scopes and event["scope"] not in self._scopes:
+            return False
+        if self._names and event["name"] not in self._names:
+            return False
+        return True
+
+    def put(self, event: dict) -> None:
+        """Adds an event to the subscriber queue without blocking, when the
+        queue is full the event is dropped and an overflow event is sent
+        instead so the client knows it has to refetch.
+
+        Args:
+            event (dict): the change event.
+        """
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            if not self._overflow:
+                self._overflow = True
+                self._before_overflow = self._queue.qsize()
+
+    async def get(self) -> dict:
+        """Waits for the next event, the overflow event follows the events
+        queued before the first dropped one.
+
+        Returns:
+            dict: the change event.
+        """
+        if self._overflow and not self._before_overflow:
+            self._overflow = False
+            return {"event": "overflow", "time": time.time()}
+        event = await self._queue.get()
+        if self._overflow:
+            self._before_overflow -= 1
+        return event
+
+
+class ScopeChangeFeed:
+    """Keeps the subscribers of the scope changes and dispatches the
+    published change events to them.
+    """
+
+    def __init__(self) -> None:
+        self._logger = Log.get_logger(self.__class__.__name__)
+        self._subscribers: Dict[uuid.UUID, ScopeSubscriber] = {}
+        self._listeners: List[Tuple[frozenset, Callable[[dict], None]]] = []
+
+    def add_listener(
+        self, callback: Callable[[dict], None], scopes: Optional[Iterable[str]] = None
+    ) -> None:
+        """Registers a callback called on the loop for every change event,
+        used by in-process caches which depend on scope objects.
+
+        Args:
+            callback (Callable[[dict], None]): the function to call with the event.
+            scopes (Iterable[str], optional): the scopes to be called for, all if empty.
+        """
+        self._listeners.append((frozenset(scopes or ()), callback))
+
+    def subscribe(
+        self, scopes: Optional[Iterable[str]] = None, names: Optional[Iterable[str]] = None
+    ) -> ScopeSubscriber:
+        """Creates and registers a new subscriber.
+
+        Args:
+            scopes (Iterable[str], optional): the scopes to receive, all if empty.
+            names (Iterable[str], optional): the object names to receive, all if empty.
+
+        Returns:
+            ScopeSubscriber: the registered subscriber.
+        """
+        subscriber = ScopeSubscriber(scopes, names)
+        self._subscribers[subscriber.id] = subscriber
+        self._logger.debug(f"The subscriber: {subscriber.id} has been added")
+        return subscriber
+
+    def unsubscribe(self, subscriber: ScopeSubscriber) -> None:
+        """Removes a subscriber from the feed.
+
+        Args:
+            subscriber (ScopeSubscriber): the subscriber to remove.
+        """
+        if self._subscribers.pop(subscriber.id, None) is not None:
+            self._logger.debug(f"The subscriber: {subscriber.id} was removed")
+
+    def publish(
+        self, scope: str, name: str, action: str, delta=None, user: Optional[str] = None
+    ) -> None:
+        """Publishes a change event to all the matching subscribers.
+
+        Args:
+            scope (str): the scope of the changed object.
+            name (str): the name of the changed object.
+            action (str): "update" or "delete".
+            delta (optional): the changes done, a list of "to_set"/"to_delete" dicts.
+            user (str, optional): the reference of the user who did the change.
+        """
+        event = {
+            "event": "change",
+            "scope": scope,
+            "name": name,
+            "action": action,
+            "delta": delta,
+            "user": user,
+            "time": time.time(),
+        }
+        for scopes, callback in self._listeners:
+            if not scopes or scope in scopes:
+                try:
+                    callback(event)
+                except Exception as error:
+                    self._logger.error(f"scope change listener failed: {error}")
+
+        for subscriber in self._subscribers.values():
+            if subscriber.match(event):
+                subscriber.put(event)
+
+
+@web.middleware
+async def publish_scope_changes(request: web.Request, handler) -> web.StreamResponse:
+    """Publishes the scope changes recorded on the request by the scope
+    handlers to the scope change feed.
+    """
+    response = await handler(request)
+    feed: ScopeChangeFeed = request.config_dict.get("scope_feed")
+    scope = request.match_info.get("scope")
+    name = request.match_info.get("name") or request.get("scope_name")
+    if feed is None or scope is None or name is None or response.status >= 400:
+        return response
+
+    user = request.get("user")
+    user = getattr(user, "ref", None)
+    if request.get("scope_delete"):
+        feed.publish(scope, name, "delete", user=user)
+    elif request.get("scope_updates"):
+        feed.publish(scope, name, "update", request["scope_updates"], user)
+    elif request.get("scope_delta"):
+        feed.publish(scope, name, "update", [request["scope_delta"]], user)
+
+    return response
@@ -0,0 +1,87 @@
+"""
+   Copyright (C) Mov.ai  - All Rights Reserved
+   Unauthorized copying of this file, via any medium is strictly prohibited
+   Proprietary and confidential
+
+   Usage:
+        Bulk access to the global and fleet Vars.
+
+        The Vars are stored in the global database as:
+            {"Var": {<scope>: {"ID": {<name>: {"Value": <value>}}}}}
+        where the name of a fleet Var is robot_name@key_name.
+"""
+from typing import Iterable, Tuple
+
+from dal.movaidb import MovaiDB
+
+VAR_DB = "global"
+VAR_SCOPES = ("global", "fleet")
+
+
+def split_var_name(scope: str, name: str) -> Tuple[str, str]:
+    """Splits the stored name of a Var into robot name and key.
+
+    Args:
+        scope (str): "global" or "fleet".
+        name (str): the stored name of the Var.
+
+    Returns:
+        Tuple[str, str]: the robot name (None for global Vars) and the key.
+    """
+    if scope == "fleet":
+        robot_name, _, key = name.partition("@")
+        return robot_name, key
+    return None, name
+
+
+def var_struct(scope: str, names: Iterable[str], value="*") -> dict:
+    """Builds the MovaiDB struct of several Vars.
+
+    Args:
+        scope (str): "global" or "fleet".
+        names (Iterable[str]): the stored names, may contain wildcards.
+        value (optional): the value to place in the struct.
+
+    Returns:
+        dict: the MovaiDB struct.
+    """
+    return {"Var": {scope: {"ID": {name: {"Value": value} for name in names}}}}
+
+
+def read_vars(scope: str, names: Iterable[str]) -> dict:
+    """Reads several Vars with a single MovaiDB query, the keys are
+    fetched in one pipeline. This is blocking thus needs to be run on an
+    executor.
+
+    Args:
+        scope (str): "global" or "fleet".
+        names (Iterable[str]): the stored names, may contain wildcards
+            like *@kms_today.
+
+    Returns:
+        dict: the stored name and value of every matching Var.
+    """
+    names = list(names)
+    if not names:
+        return {}
+    result = MovaiDB(VAR_DB).get(var_struct(scope, names)) or {}
+    found = result.get("Var", {}).get(scope, {}).get("ID", {})
+    return {name: fields.get("Value") for name, fields in found.items()}
+
+
+def write_vars(values: dict) -> bool:
+    """Writes several Vars with a single pipe. This is blocking thus needs
+    to be run on an executor.
+
+    Args:
+        values (dict): scope -> stored name -> value.
+
+    Returns:
+        bool: True if the pipe was executed successfully.
+    """
+    movai_db = MovaiDB(VAR_DB)
+    pipe = movai_db.create_pipe()
+    for scope, names in values.items():
+        struct = {"Var": {scope: {"ID": {name: {"Value": value} for name, value in names.items()}}}}
+        movai_db.set(struct, pipe=pipe)
+    return bool(movai_db.execute_pipe(pipe))
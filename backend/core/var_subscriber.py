@@ -0,0 +1,257 @@
+"""
+   Copyright (C) Mov.ai  - All Rights Reserved
+   Unauthorized copying of this file, via any medium is strictly prohibited
+   Proprietary and confidential
+
+   Usage:
+        Pushes the changes of global and fleet Vars to the subscribed
+        clients. A single Redis keyspace subscription is shared by all the
+        clients of the process, it requires the keyspace notifications to
+        be enabled on the global Redis (notify-keyspace-events).
+"""
+import asyncio
+import json
+import re
+import threading
+import time
+import uuid
+from datetime import date
+from fnmatch import fnmatchcase
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from movai_core_shared.logger import Log
+
+from dal.movaidb import MovaiDB
+
+from backend.core.async_dal import AsyncDAL
+from backend.core.var_access import VAR_DB, VAR_SCOPES, read_vars, split_var_name
+
+KEYSPACE_PATTERN = "__keyspace@*__:Var:*"
+KEYSPACE_REGEX = re.compile(r"^__keyspace@\d+__:Var:(?P<scope>[^,]+),ID:(?P<name>.+),Value:$")
+SUBSCRIPTION_QUEUE_SIZE = 1000
+LISTEN_TIMEOUT = 1.0  # seconds
+LISTEN_RETRY = 1.0  # seconds before subscribing again after a failure
+
+
+class VarSubscription:
+    """The Var patterns a client is subscribed to and the changes waiting
+    to be sent to it.
+    """
+
+    def __init__(self) -> None:
+        self._id = uuid.uuid4()
+        self._patterns: Dict[str, Set[str]] = {scope: set() for scope in VAR_SCOPES}
+        self._queue = asyncio.Queue(SUBSCRIPTION_QUEUE_SIZE)
+
+    @property
+    def id(self) -> uuid.UUID:
+        return self._id
+
+    def subscribe(self, scope: str, patterns: Iterable[str]) -> None:
+        """Adds Var name patterns, fleet patterns are robot_name@key_name.
+
+        Args:
+            scope (str): "global" or "fleet".
+            patterns (Iterable[str]): the names or wildcard patterns.
+        """
+        self._patterns[scope].update(patterns)
+
+    def unsubscribe(self, scope: str, patterns: Iterable[str]) -> None:
+        """Removes Var name patterns.
+
+        Args:
+            scope (str): "global" or "fleet".
+            patterns (Iterable[str]): the names or wildcard patterns.
+        """
+        self._patterns[scope].difference_update(patterns)
+
+    def match(self, scope: str, name: str) -> bool:
+        """Checks if the client is subscribed to a Var.
+
+        Args:
+            scope (str): "global" or "fleet".
+            name (str): the stored name of the Var.
+
+        Returns:
+            bool: True if one of the patterns matches.
+        """
+        return any(fnmatchcase(name, pattern) for pattern in self._patterns.get(scope, ()))
+
+    def put(self, change: dict) -> None:
+        """Adds a change without blocking, the oldest change is dropped
+        when the queue is full.
+
+        Args:
+            change (dict): the Var change.
+        """
+        if self._queue.full():
+            self._queue.get_nowait()
+        self._queue.put_nowait(change)
+
+    async def get(self) -> dict:
+        """Waits for the next change.
+
+        Returns:
+            dict: the Var change.
+        """
+        return await self._queue.get()
+
+
+class VarSubscriptionHub:
+    """Listens to the keyspace notifications of the Vars and fans them out
+    to the matching subscriptions.
+    """
+
+    def __init__(self, dal: AsyncDAL = None) -> None:
+        """Initializes the object.
+
+        Args:
+            dal (AsyncDAL, optional): the adapter used to read the values.
+        """
+        self._logger = Log.get_logger(self.__class__.__name__)
+        self._dal = dal or AsyncDAL()
+        self._subscriptions: Dict[uuid.UUID, VarSubscription] = {}
+        # Vars being read, True when they changed again during the read
+        self._pending: Dict[Tuple[str, str], bool] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    def register(self, subscription: VarSubscription) -> None:
+        """Registers a subscription, the keyspace listener is started with
+        the first one.
+
+        Args:
+            subscription (VarSubscription): the subscription to add.
+        """
+        self._subscriptions[subscription.id] = subscription
+        if not self._running:
+            self.start()
+
+    def unregister(self, subscription: VarSubscription) -> None:
+        """Removes a subscription.
+
+        Args:
+            subscription (VarSubscription): the subscription to remove.
+        """
+        self._subscriptions.pop(subscription.id, None)
+
+    def start(self) -> None:
+        self._loop = asyncio.get_event_loop()
+        self._running = True
+        self._thread = threading.Thread(target=self._listen, name="var-keyspace", daemon=True)
+        self._thread.start()
+        self._logger.info("listening to Var keyspace notifications")
+
+    def stop(self) -> None:
+        self._running = False
+
+    def _listen(self) -> None:
+        """Runs on a thread, receives the keyspace notifications and hands
+        them to the loop. After a failure the subscriptions are told that
+        changes may have been missed and the keyspace is subscribed again.
+        """
+        while self._running:
+            try:
+                self._receive()
+            except Exception as error:
+                self._logger.error(
+                    f"Var keyspace listener failed, restarting in {LISTEN_RETRY}s: {error}"
+                )
+                self._loop.call_soon_threadsafe(
+                    self._broadcast,
+                    {"event": "error", "error": "Var changes may have been missed"},
+                )
+                time.sleep(LISTEN_RETRY)
+
+    def _receive(self) -> None:
+        pubsub = MovaiDB(VAR_DB).db_read.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.psubscribe(KEYSPACE_PATTERN)
+            while self._running:
+                msg = pubsub.get_message(timeout=LISTEN_TIMEOUT)
+                if msg is None:
+                    continue
+                channel, event = msg["channel"], msg["data"]
+                if isinstance(channel, bytes):
+                    channel = channel.decode()
+                if isinstance(event, bytes):
+                    event = event.decode()
+                self._loop.call_soon_threadsafe(self._on_notification, channel, event)
+        finally:
+            pubsub.close()
+
+    def _broadcast(self, event: dict) -> None:
+        for subscription in self._subscriptions.values():
+            subscription.put(event)
+
+    def _on_notification(self, channel: str, event: str) -> None:
+        match = KEYSPACE_REGEX.match(channel)
+        if match is None:
+            return
+        scope, name = match.group("scope"), match.group("name")
+        if not any(sub.match(scope, name) for sub in self._subscriptions.values()):
+            return
+        if event in ("del", "expired"):
+            self._dispatch(scope, name, None, deleted=True)
+        elif (scope, name) in self._pending:
+            # a burst of writes to the same Var is read once more at most
+            self._pending[(scope, name)] = True
+        else:
+            self._pending[(scope, name)] = False
+            asyncio.ensure_future(self._read_and_dispatch(scope, name))
+
+    async def _read_and_dispatch(self, scope: str, name: str) -> None:
+        try:
+            while True:
+                values = await self._dal.run(read_vars, scope, [name])
+                if name in values:
+                    self._dispatch(scope, name, values[name])
+                if not self._pending[(scope, name)]:
+                    break
+                self._pending[(scope, name)] = False
+        except Exception as error:
+            self._logger.error(f"failed to read Var {scope}:{name}, {error}")
+        finally:
+            self._pending.pop((scope, name), None)
+
+    def _dispatch(self, scope: str, name: str, value, deleted: bool = False) -> None:
+        change = self.format_change(scope, name, value, deleted)
+        for subscription in self._subscriptions.values():
+            if subscription.match(scope, name):
+                subscription.put(change)
+
+    @staticmethod
+    def format_change(scope: str, name: str, value, deleted: bool = False) -> dict:
+        """Formats a Var change the same way get_key_value formats a value.
+
+        Args:
+            scope (str): "global" or "fleet".
+            name (str): the stored name of the Var.
+            value: the new value.
+            deleted (bool, optional): True if the Var was deleted.
+
+        Returns:
+            dict: the change sent to the clients.
+        """
+        robot_name, key = split_var_name(scope, name)
+        change = {"event": "del" if deleted else "set", "scope": scope, "key": key, "value": value}
+        if robot_name is not None:
+            change["robot"] = robot_name
+        if isinstance(value, date):
+            change["value"] = json.loads(json.dumps(value, default=str))
+            change["is_date"] = True
+        return change
+
+    async def snapshot(self, scope: str, patterns: Iterable[str]) -> list:
+        """Reads the current value of the Vars matching the patterns.
+
+        Args:
+            scope (str): "global" or "fleet".
+            patterns (Iterable[str]): the names or wildcard patterns.
+
+        Returns:
+            list: a change for every matching Var.
+        """
+        values = await self._dal.run(read_vars, scope, patterns)
+        return [self.format_change(scope, name, value) for name, value in values.items()]
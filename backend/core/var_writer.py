@@ -0,0 +1,110 @@
+"""
+   Copyright (C) Mov.ai  - All Rights Reserved
+   Unauthorized copying of this file, via any medium is strictly prohibited
+   Proprietary and confidential
+
+   Usage:
+        Coalesces the high frequency writes of designated Vars, only the
+        latest value of each Var within the window is written.
+
+        A queued write is acknowledged before it reaches the database, the
+        readers flush the pending writes first to see the latest values.
+
+        The coalesced keys are opt-in through environment variables:
+            VAR_COALESCE_KEYS=pose_goal,pose_estimation
+            VAR_COALESCE_WINDOW_MS=100
+"""
+import os
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+from movai_core_shared.logger import Log
+
+from backend.core.var_access import split_var_name, write_vars
+
+COALESCE_KEYS = [
+    key.strip() for key in os.getenv("VAR_COALESCE_KEYS", "").split(",") if key.strip()
+]
+COALESCE_WINDOW = float(os.getenv("VAR_COALESCE_WINDOW_MS", "100")) / 1000
+
+
+class CoalescingVarWriter:
+    """Keeps the latest value of the designated Vars and flushes them all
+    through one pipe at the end of the window.
+    """
+
+    def __init__(self, keys: Iterable[str] = (), window: float = COALESCE_WINDOW) -> None:
+        """Initializes the object.
+
+        Args:
+            keys (Iterable[str], optional): the key names to coalesce.
+            window (float, optional): seconds to keep the values before writing.
+        """
+        self._logger = Log.get_logger(self.__class__.__name__)
+        self._keys = frozenset(keys)
+        self._window = window
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[str, str], object] = {}
+        self._timer: Optional[threading.Timer] = None
+
+    def is_coalesced(self, key: str) -> bool:
+        """Checks if the writes of a key are coalesced.
+
+        Args:
+            key (str): the key name, without the robot name.
+
+        Returns:
+            bool: True if coalesced.
+        """
+        return key in self._keys
+
+    @property
+    def pending(self) -> int:
+        """The number of writes waiting for the end of the window."""
+        return len(self._pending)
+
+    def set(self, scope: str, name: str, value) -> bool:
+        """Queues the write of a Var if its key is coalesced.
+
+        Args:
+            scope (str): "global" or "fleet".
+            name (str): the stored name of the Var (robot_name@key_name for fleet).
+            value: the value to write.
+
+        Returns:
+            bool: True if the write was queued, False if the caller
+                needs to write it.
+        """
+        scope = scope.lower()
+        _, key = split_var_name(scope, name)
+        if not self.is_coalesced(key):
+            return False
+        with self._lock:
+            self._pending[(scope, name)] = value
+            if self._timer is None:
+                self._timer = threading.Timer(self._window, self.flush)
+                self._timer.start()
+        return True
+
+    def flush(self) -> None:
+        """Writes the pending values, this is blocking thus needs to be run
+        on an executor from the event loop.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = None
+        if not pending:
+            return
+
+        values = {}
+        for (scope, name), value in pending.items():
+            values.setdefault(scope, {})[name] = value
+        try:
+            write_vars(values)
+        except Exception as error:
+            self._logger.error(f"failed to write {len(pending)} coalesced Vars: {error}")
+
+
+VAR_WRITER = CoalescingVarWriter(COALESCE_KEYS)
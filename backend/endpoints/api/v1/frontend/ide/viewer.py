@@ -17,6 +17,8 @@ from dal.models.var import Var as Variable
 from dal.scopes.fleetrobot import FleetRobot
 from dal.scopes.package import Package
 
+from backend.core.var_writer import VAR_WRITER
+
 
 LOGGER = Log.get_logger(__name__)
 
@@ -562,9 +564,9 @@ class Viewer:
         Set variable Var:<robot_name>@pose_estimation
         """
         sprint("Set pose estimation:", robot_name, pose, params)
-        Variable("Fleet", _robot_name=robot_name).set(
-            "pose_estimation", {"pose": pose, "params": params}
-        )
+        value = {"pose": pose, "params": params}
+        if not VAR_WRITER.set("fleet", f"{robot_name}@pose_estimation", value):
+            Variable("Fleet", _robot_name=robot_name).set("pose_estimation", value)
 
     @staticmethod
     def set_robot_pose_goal(robot_name, pose):
@@ -572,4 +574,5 @@ class Viewer:
         Set variable Var:<robot_name>@pose_goal
         """
         sprint("Set pose goal:", robot_name, pose)
-        Variable("Fleet", _robot_name=robot_name).set("pose_goal", pose)
+        if not VAR_WRITER.set("fleet", f"{robot_name}@pose_goal", pose):
+            Variable("Fleet", _robot_name=robot_name).set("pose_goal", pose)
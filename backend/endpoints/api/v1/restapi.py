@@ -17,10 +17,12 @@ import json
 import urllib.parse
 from datetime import datetime, date
 import inspect
+import time
 from mimetypes import guess_type
 from string import Template
+from concurrent.futures import Executor
 from urllib.parse import unquote
-from typing import Any, List
+from typing import Any, List, Optional, Tuple
 
 
 from aiohttp import web
@@ -32,7 +34,6 @@ from movai_core_shared.envvars import SCOPES_TO_TRACK
 from movai_core_shared.logger import Log, LogsQuery
 
 from dal.helpers.helpers import Helpers
-from dal.models.acl import NewACLManager
 from dal.models.lock import Lock
 from dal.models.role import Role
 from dal.models.var import Var
@@ -79,12 +80,35 @@ except ImportError:
 
 from gd_node.callback import GD_Callback
 
+from backend.core.async_dal import AsyncDAL
+from backend.core.log_query import (
+    EXPORT_FORMATS,
+    HISTOGRAM_BUCKET,
+    NDJSON_FORMAT,
+    CsvFormatter,
+    date_params,
+    decode_cursor,
+    export_logs,
+    format_ndjson,
+    get_date_range,
+    get_logs_per_robot,
+    log_histogram,
+    split_robots,
+)
+from backend.core.query_cache import QueryCache
+from backend.core.var_access import read_vars, split_var_name
+from backend.core.var_writer import VAR_WRITER
 from backend.endpoints.api.v1.robot_reovery import trigger_recovery_aux
 from backend.endpoints.api.v1.frontend import frontend_map
-from backend.helpers.rest_helpers import deprecate_endpoint, fetch_request_params
+from backend.helpers.rest_helpers import deprecate_endpoint, fetch_request_params, read_lines
 
 LOGGER = Log.get_logger(__name__)
 PAGE_SIZE = 100
+IMPORT_BATCH_SIZE = 500
+# a batch is written once it holds this many bytes, bounding the memory of
+# the parsed objects to a few times IMPORT_BATCH_BYTES + IMPORT_MAX_LINE
+IMPORT_BATCH_BYTES = 4 * 1024 * 1024
+IMPORT_MAX_LINE = 16 * 1024 * 1024  # bytes of a single imported object
 MOVAI_RESPONSE_HEADER = {"Server": "Movai-server"}
 
 class MagicDict(dict):
@@ -101,9 +125,10 @@ class MagicDict(dict):
 class RestAPI:
     """Class that serves REST methods to communicate with database"""
 
-    def __init__(self, node_name, api_version="/api/v1/"):
+    def __init__(self, node_name, api_version="/api/v1/", executor: Executor = None):
         self.api_version = api_version
         self.node_name = node_name
+        self._dal = AsyncDAL(executor)
         self.scope_classes = {
             "Application": Application,
             "Callback": Callback,
@@ -121,19 +146,19 @@ class RestAPI:
         self.scope_classes.update(enterprise_scope)
 
     async def cloud_func(self, request):
-        """Run specific callback"""
+        """Run specific callback, the user code makes blocking database calls
+        thus the callback is loaded and executed on the executor, the body is
+        read on the event loop before. The request given to the callback must
+        only be read, its coroutines can not be awaited from the executor.
+        """
         callback_name = request.match_info["cb_name"]
         # AppName to use in Callback permission validation
         app_name = request.match_info.get("app_name", None)
 
         try:
-            callback = GD_Callback(callback_name, self.node_name, "cloud", False)
-
-            # Check User permissions
-            #scope_obj = self.scope_classes["Callback"](name=callback_name)
-            scope_obj = Callback(callback_name)
-            if not scope_obj.has_permission(request.get("user"), "execute", app_name):
-                raise ValueError("User does not have permission")
+            callback = await self._dal.run(
+                self._load_callback, request.get("user"), callback_name, app_name
+            )
 
             body = {}
             if request.can_read_body:
@@ -148,7 +173,7 @@ class RestAPI:
                     "status_code": 200,
                 }
             )
-            callback.execute(body)
+            await self._dal.run(callback.execute, body)
 
             return web.json_response(
                 callback.updated_globals["response"],
@@ -158,6 +183,22 @@ class RestAPI:
         except Exception as exc:
             raise web.HTTPBadRequest(reason=str(exc), headers=MOVAI_RESPONSE_HEADER)
 
+    def _load_callback(self, user, callback_name: str, app_name: str) -> GD_Callback:
+        """Loads a callback and checks the user may execute it, this is
+        blocking thus needs to be run on an executor.
+
+        Returns:
+            GD_Callback: the callback.
+        """
+        callback = GD_Callback(callback_name, self.node_name, "cloud", False)
+
+        # Check User permissions
+        #scope_obj = self.scope_classes["Callback"](name=callback_name)
+        scope_obj = Callback(callback_name)
+        if not scope_obj.has_permission(user, "execute", app_name):
+            raise ValueError("User does not have permission")
+        return callback
+
     async def frontend_apps(self, request: web.Request):
         try:
             response = {"success": True}
@@ -180,11 +221,11 @@ class RestAPI:
 
             args = data.get("args")
             if isinstance(args, dict):
-                response["result"] = action_map[func](**args)
+                response["result"] = await self._dal.run(action_map[func], **args)
             elif isinstance(args, (list, tuple)):
-                response["result"] = action_map[func](*args)
+                response["result"] = await self._dal.run(action_map[func], *args)
             else:
-                response["result"] = action_map[func](args)
+                response["result"] = await self._dal.run(action_map[func], args)
         except Exception as exc:
             LOGGER.error(exc)
             response = {"success": False, "error": str(exc)}
@@ -204,12 +245,104 @@ class RestAPI:
             limit
             tags
             services
+            fromDate (or from)
+            toDate (or to)
+        """
+        params = date_params(fetch_request_params(request))
+        cache: QueryCache = request.config_dict["query_cache"]
+
+        try:
+            status = 200
+            robots = split_robots(params)
+            if len(robots) > 1:
+                query = lambda: get_logs_per_robot(params, robots)
+            else:
+                query = lambda: LogsQuery.get_logs(pagination=True, **params)
+            output = await cache.get(cache.make_key("logs", params), query)
+        except ValueError as err:
+            raise web.HTTPBadRequest(reason=str(err))
+        except Exception as err:
+            status = 401
+            output = {"error": str(err)}
+
+        return web.json_response(output, status=status, headers=MOVAI_RESPONSE_HEADER)
+
+    async def export_logs(self, request: web.Request) -> web.StreamResponse:
+        """Export logs from HealthNode as a stream, from the newest to the oldest
+        path:
+            /logs/export/
+
+        parameters:
+            the get_logs parameters except limit and offset
+            format: ndjson (default) or csv
+            cursor: the cursor of the last log received, resumes the export
+
+        every log has a cursor field, in case of a failure the export is
+        resumed by passing the cursor of the last log received.
         """
         params = fetch_request_params(request)
+        export_format = params.get("format", NDJSON_FORMAT)
+        if export_format not in EXPORT_FORMATS:
+            raise web.HTTPBadRequest(reason=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+        cursor = params.get("cursor")
+        try:
+            if cursor:
+                decode_cursor(cursor)
+        except ValueError as error:
+            raise web.HTTPBadRequest(reason=str(error))
+
+        response = web.StreamResponse(
+            headers={
+                **MOVAI_RESPONSE_HEADER,
+                "Content-Type": EXPORT_FORMATS[export_format],
+                "Content-Disposition": f'attachment; filename="logs.{export_format}"',
+            }
+        )
+        await response.prepare(request)
+        formatter = format_ndjson if export_format == NDJSON_FORMAT else CsvFormatter()
+        try:
+            async for logs in export_logs(params, cursor):
+                await response.write(formatter(logs))
+        except Exception as error:
+            LOGGER.error(f"logs export failed: {error}")
+            # the client resumes from the cursor of the last log received
+            if export_format == NDJSON_FORMAT:
+                await response.write(format_ndjson([{"error": str(error)}]))
+            else:
+                await response.write(f"# error: {error}\n".encode())
+        await response.write_eof()
+        return response
+
+    async def get_logs_histogram(self, request: web.Request) -> web.Response:
+        """Get the number of logs per time bucket and level
+        path:
+            /logs/histogram/
+
+        parameters:
+            from (or fromDate)
+            to (or toDate), now by default
+            bucket: the bucket duration in seconds, 60 by default
+            the get_logs filter parameters, robots, levels, services...
+        """
+        params = fetch_request_params(request)
+        from_, to = get_date_range(params)
+        try:
+            from_ = float(from_)
+            to = float(to) if to is not None else time.time()
+            bucket = float(params.get("bucket", HISTOGRAM_BUCKET))
+        except (TypeError, ValueError):
+            raise web.HTTPBadRequest(reason="from, to and bucket must be numbers")
+        if bucket <= 0 or to <= from_:
+            raise web.HTTPBadRequest(reason="bucket must be positive and from before to")
 
         try:
             status = 200
-            output = await LogsQuery.get_logs(pagination=True, **params)
+            buckets = await log_histogram(
+                params, from_, to, bucket, request.config_dict["histogram_cache"]
+            )
+            output = {"from": from_, "to": to, "bucket": bucket, "buckets": buckets}
+        except ValueError as err:
+            raise web.HTTPBadRequest(reason=str(err))
         except Exception as err:
             status = 401
             output = {"error": str(err)}
@@ -281,11 +414,35 @@ class RestAPI:
 
     async def get_permissions(self, request):
         try:
-            output = NewACLManager.get_permissions()
+            output = await request.config_dict["app_catalog"].get_permissions(self._dal)
             return web.json_response(output, status=200, headers=MOVAI_RESPONSE_HEADER)
         except Exception as exc:
             raise web.HTTPBadRequest(reason=str(exc), headers=MOVAI_RESPONSE_HEADER)
 
+    async def get_loop_lag(self, request: web.Request) -> web.Response:
+        """Get the event loop lag statistics
+        path:
+            /health/loop-lag/
+        """
+        monitor = request.config_dict.get("loop_monitor")
+        if monitor is None:
+            raise web.HTTPNotFound(reason="The loop monitor is not running.")
+        return web.json_response(monitor.stats(), headers=MOVAI_RESPONSE_HEADER)
+
+    async def get_log_streaming_stats(self, request: web.Request) -> web.Response:
+        """Get the live log stream statistics, the ingest rate and the
+        registered clients with their filter, queue depth and counters,
+        along with the counters of the log query caches
+        path:
+            /health/log-streaming/
+        """
+        if request.get("user").Superuser is not True:
+            raise web.HTTPForbidden(reason="User does not have permission.")
+        stats = request.config_dict["log_streamer"].stats()
+        stats["query_cache"] = request.config_dict["query_cache"].stats()
+        stats["histogram_cache"] = request.config_dict["histogram_cache"].stats()
+        return web.json_response(stats, headers=MOVAI_RESPONSE_HEADER)
+
     async def get_metrics(self, request):
         """Get metrics from message-server"""
         if not ENTERPRISE:
@@ -299,13 +456,15 @@ class RestAPI:
             tags = params["tags"].split(",")
         else:
             tags = []
+        cache: QueryCache = request.config_dict["query_cache"]
         try:
             status = 200
-            metrics = Metrics()
-            output = metrics.get_metrics(
-                **params,
-                tags=tags,
-                pagination=True,
+            # the Metrics client is only created when the query is not cached
+            output = await cache.get(
+                cache.make_key("metrics", params),
+                lambda: self._dal.run(
+                    lambda: Metrics().get_metrics(**params, tags=tags, pagination=True)
+                ),
             )
         except Exception as exc:
             status = 401
@@ -322,12 +481,7 @@ class RestAPI:
         try:
             # Check sanity of request url parms
             decoded_params = urllib.parse.unquote(request.query_string)
-            # Get app information
-            app = Application(app_name)
-            content_type = guess_type(app.EntryPoint)[0]
-            html = Package(app.Package).File[app.EntryPoint].Value
-
-            html = self.spa_parse_template(app, html, request)
+            html, content_type = await self._dal.run(self._load_spa, app_name, request)
 
         except Exception as error:
             html = f"<div style='top:40%;left:35%;position:absolute'><p>Error while trying to serve {app_name}</p><p style='color:red'>{error}</p></div>"
@@ -336,6 +490,20 @@ class RestAPI:
             body=html, content_type=content_type, headers=MOVAI_RESPONSE_HEADER
         )
 
+    def _load_spa(self, app_name: str, request: web.Request) -> tuple:
+        """Loads the application html, this is blocking thus needs to be run
+        on an executor.
+
+        Returns:
+            tuple: the parsed html and its content type.
+        """
+        # Get app information
+        app = Application(app_name)
+        content_type = guess_type(app.EntryPoint)[0]
+        html = Package(app.Package).File[app.EntryPoint].Value
+
+        return self.spa_parse_template(app, html, request), content_type
+
     def spa_parse_template(self, application: Application, html, request):
         """parse application params"""
 
@@ -385,7 +553,7 @@ class RestAPI:
         try:
             data = await request.json()
             robot_id = data.get("id")
-            trigger_recovery_aux(robot_id)
+            await self._dal.run(trigger_recovery_aux, robot_id)
 
         except Exception as error:
             msg = f"Caught expection {error}"
@@ -514,8 +682,8 @@ class RestAPI:
         """
         name = request.match_info["name"]
         try:
-            mutex = Lock(name)
-            if mutex.release():
+            mutex = await self._dal.scope(Lock, name)
+            if await mutex.release():
                 return web.json_response({"success": True}, headers=MOVAI_RESPONSE_HEADER)
             else:
                 return web.json_response(
@@ -538,15 +706,9 @@ class RestAPI:
         key = request.match_info["key"]
         output = {"scope": scope, "key": key, "value": None}
         if all([scope, key]):
-            if scope == "fleet":
-                try:
-                    _robot_name, key = key.split("@")
-                    var_scope = Var(scope=scope, _robot_name=_robot_name)
-                except Exception as error:
-                    raise web.HTTPBadRequest(reason=str(error))
-            else:
-                var_scope = Var(scope=scope)
-            value = var_scope.get(key)
+            await self._flush_var_writes()
+            var_scope, key = await self._var_scope_async(scope, key)
+            value = await var_scope.get(key)
             if isinstance(value, date):
                 value = json.loads(json.dumps(value, default=str))
                 output["is_date"] = True
@@ -557,10 +719,87 @@ class RestAPI:
             headers=MOVAI_RESPONSE_HEADER,
         )
 
+    async def get_key_values(self, request: web.Request) -> web.Response:
+        """[GET] api get the value of several keys handler
+        curl http://localhost:5003/api/v1/database/global/?keys=key1,key2
+        curl http://localhost:5003/api/v1/database/fleet/?keys=*@kms_today,agv1@pose_goal
+
+        all the keys are read in a single pipeline, fleet keys may use
+        wildcards and are returned as a robot_name -> key_name -> value map.
+        the keys holding a date are listed in "dates" (robot_name@key_name
+        for fleet).
+        """
+        scope = request.match_info["scope"]
+        keys = [key.strip() for key in request.rel_url.query.get("keys", "").split(",")]
+        keys = [key for key in keys if key]
+        if not keys:
+            raise web.HTTPBadRequest(
+                reason="Required parameter 'keys' not found.", headers=MOVAI_RESPONSE_HEADER
+            )
+        if scope == "fleet" and not all("@" in key for key in keys):
+            raise web.HTTPBadRequest(
+                reason="fleet keys must be in the format robot_name@key_name",
+                headers=MOVAI_RESPONSE_HEADER,
+            )
+
+        await self._flush_var_writes()
+        values = await self._dal.run(read_vars, scope, keys)
+        output = {"scope": scope, "values": {}, "dates": []}
+        for name, value in values.items():
+            if isinstance(value, date):
+                value = json.loads(json.dumps(value, default=str))
+                output["dates"].append(name)
+            robot_name, key = split_var_name(scope, name)
+            if robot_name is None:
+                output["values"][key] = value
+            else:
+                output["values"].setdefault(robot_name, {})[key] = value
+
+        return web.json_response(output, headers=MOVAI_RESPONSE_HEADER)
+
+    async def _flush_var_writes(self) -> None:
+        """Writes the coalesced Vars not written yet, so a read returns the
+        value acknowledged by a previous set.
+        """
+        if VAR_WRITER.pending:
+            await self._dal.run(VAR_WRITER.flush)
+
+    @staticmethod
+    def _var_scope(scope: str, key: str) -> Tuple[Var, str]:
+        """Creates the Var object of the scope, fleet keys are in the
+        format robot_name@key_name. This is blocking thus needs to be run
+        on an executor.
+
+        Raises:
+            web.HTTPBadRequest: in case the key is not valid.
+
+        Returns:
+            Tuple[Var, str]: the Var object and the key name.
+        """
+        if scope == "fleet":
+            try:
+                _robot_name, key = key.split("@")
+                var_scope = Var(scope=scope, _robot_name=_robot_name)
+            except Exception as error:
+                raise web.HTTPBadRequest(reason=str(error))
+        else:
+            var_scope = Var(scope=scope)
+        return var_scope, key
+
+    async def _var_scope_async(self, scope: str, key: str):
+        """Creates the wrapped Var object of the scope.
+
+        Returns:
+            Tuple[AsyncProxy, str]: the wrapped Var object and the key name.
+        """
+        var_scope, key = await self._dal.run(self._var_scope, scope, key)
+        return self._dal.wrap(var_scope), key
+
     async def _forward_alerts_config(self, request: web.Request, data: dict) -> web.Response:
         from ..v2.db import _check_user_permission
 
-        curr_alerts_config = Var("global").get("alertsConfig")
+        var_global = await self._dal.var("global")
+        curr_alerts_config = await var_global.get("alertsConfig")
         set_emails = False
         set_alerts = False
         to_set = curr_alerts_config or {"emails": [], "alerts": []}
@@ -580,17 +819,20 @@ class RestAPI:
                 _check_user_permission(request, "EmailsAlertsConfig", "update")
                 set_alerts = True
 
-        var_global = Var("global")
         if set_emails:
             to_set["emails"] = data["emails"]
-            setattr(var_global, "alertsConfig", to_set)
+            await var_global.setattr("alertsConfig", to_set)
         elif set_alerts:
             to_set["alerts"] = data["alerts"]
-            setattr(var_global, "alertsConfig", to_set)
+            await var_global.setattr("alertsConfig", to_set)
 
     async def set_key_value(self, request: web.Request) -> web.Response:
         """[POST] api set key value handler
         curl -d "scope=fleet&key=agv1@qwerty&value=123456" -X POST http://localhost:5003/api/v1/database/
+
+        the writes of the VAR_COALESCE_KEYS are acknowledged before they are
+        written, they reach the database within VAR_COALESCE_WINDOW_MS, the
+        GET handlers of this api write them first.
         """
         data = await request.json()
         if "key" not in data:
@@ -602,20 +844,16 @@ class RestAPI:
         key = data.get("key", None)  # fleet: robot_name@key_name
         value = data.get("value", None)
         scope = data.get("scope", None)
-        if scope == "fleet":
-            try:
-                _robot_name, key = key.split("@")
-                var_scope = Var(scope=scope, _robot_name=_robot_name)
-            except Exception as error:
-                raise web.HTTPBadRequest(reason=str(error))
-        else:
-            var_scope = Var(scope=scope)
+        if not isinstance(scope, str) or not isinstance(key, str):
+            raise web.HTTPBadRequest(reason="'scope' and 'key' must be strings.")
+        name = key
+        var_scope, key = await self._var_scope_async(scope, key)
         if key == "alertsConfig":
             # TODO: remove this when we remove the old alerts config
             # forward message to /api/v2/alerts/*
             await self._forward_alerts_config(request, data["value"])
-        else:
-            setattr(var_scope, key, value)
+        elif not VAR_WRITER.set(scope, name, value):
+            await var_scope.setattr(key, value)
 
         return web.json_response(
             {"key": key, "value": value, "scope": scope},
@@ -629,15 +867,8 @@ class RestAPI:
         scope = request.match_info["scope"]
         key = unquote(request.match_info["key"])
         if all([scope, key]):
-            if scope == "fleet":
-                try:
-                    _robot_name, key = key.split("@")
-                    var_scope = Var(scope=scope, _robot_name=_robot_name)
-                except Exception as error:
-                    raise web.HTTPBadRequest(reason=str(error))
-            else:
-                var_scope = Var(scope=scope)
-            var_scope.delete(name=key)
+            var_scope, key = await self._var_scope_async(scope, key)
+            await var_scope.delete(name=key)
             return web.json_response({"success": True}, headers=MOVAI_RESPONSE_HEADER)
         raise web.HTTPBadRequest(reason="Required keys (scope, key) not found.")
 
@@ -654,30 +885,9 @@ class RestAPI:
             web.HTTPBadRequest(reason)
         """
 
-        def create_application_format(url, label, icon, enable, app_type):
-            return {
-                "URL": url,
-                "Label": label,
-                "Icon": icon,
-                "Enabled": enable,
-                "Type": app_type,
-            }
-
         try:
-            permissions = NewACLManager.get_permissions()["Applications"]
-            output = {"success": True, "result": []}
-
-            apps: List[Application] = Application.get_model_objects()
-            for app in apps:
-                url = app.Package if app.Type == "application" else app.EntryPoint
-                label = app.Label
-                icon = app.Icon
-                enable = len(list(filter(lambda x: x == app.name, permissions))) > 0
-                app_type = app.Type
-                output["result"].append(
-                    create_application_format(url, label, icon, enable, app_type)
-                )
-
+            catalog = request.config_dict["app_catalog"]
+            output = {"success": True, "result": await catalog.get_applications(self._dal)}
         except Exception as error:
             raise web.HTTPBadRequest(reason=str(error), headers=MOVAI_RESPONSE_HEADER)
 
@@ -718,8 +928,10 @@ class RestAPI:
         assert field.name == "data"
         data = await field.read()
         try:
-            package = Package.get_or_create(package_name)
-            package.add("File", f"{package_file}", Value=bytes(data), FileLabel=package_file)
+            package = await self._dal.run(Package.get_or_create, package_name)
+            await self._dal.run(
+                package.add, "File", f"{package_file}", Value=bytes(data), FileLabel=package_file
+            )
         except Exception as exc:
             return web.json_response(
                 {"success": False, "error": str(exc)}, headers=MOVAI_RESPONSE_HEADER
@@ -735,6 +947,30 @@ class RestAPI:
         scope = request.match_info.get("scope")
         _id = request.match_info.get("name", False)
 
+        result = await self._dal.run(self._read_scope, request, scope, _id)
+
+        if not result:
+            raise web.HTTPNotFound(reason="Required scope not found.")
+
+        try:
+            json_result = json.dumps(result, default=self.json_serializer_converter)
+            validated_result = json.loads(json_result)
+        except Exception as exc:
+            LOGGER.error(f"caught error while creating json, exception: {exc}")
+            raise web.HTTPBadRequest(
+                reason="Error when serializing JSON response.",
+                headers=MOVAI_RESPONSE_HEADER,
+            )
+
+        return web.json_response(validated_result, headers=MOVAI_RESPONSE_HEADER)
+
+    def _read_scope(self, request: web.Request, scope: str, _id: str) -> dict:
+        """Reads a scope object or a full scope, this is blocking thus
+        needs to be run on an executor.
+
+        Returns:
+            dict: the scope data.
+        """
         if _id:
             try:
                 scope_obj = self.scope_classes[scope](_id)
@@ -773,20 +1009,7 @@ class RestAPI:
                 scope_result = MovaiDB().get_by_args(scope)
             result = scope_result.get(scope, {})
 
-        if not result:
-            raise web.HTTPNotFound(reason="Required scope not found.")
-
-        try:
-            json_result = json.dumps(result, default=self.json_serializer_converter)
-            validated_result = json.loads(json_result)
-        except Exception as exc:
-            LOGGER.error(f"caught error while creating json, exception: {exc}")
-            raise web.HTTPBadRequest(
-                reason="Error when serializing JSON response.",
-                headers=MOVAI_RESPONSE_HEADER,
-            )
-
-        return web.json_response(validated_result, headers=MOVAI_RESPONSE_HEADER)
+        return result
 
     async def add_to_scope(self, request: web.Request) -> web.Response:
         """ [PUT] api add keys to scope
@@ -809,10 +1032,22 @@ class RestAPI:
             data = data.get("data", data)
             # track scope changes
             data.update(self.track_scope(request, scope))
-            _to_set = {scope: {_id: data}}
         except Exception as exc:
             raise web.HTTPBadRequest(reason=str(exc))
 
+        await self._dal.run(self._update_scope, request, scope, _id, data)
+
+        # Info to use on middleware
+        request["scope_delta"] = {"to_set": data}
+
+        return web.json_response({"success": True}, headers=MOVAI_RESPONSE_HEADER)
+
+    def _update_scope(self, request: web.Request, scope: str, _id: str, data: dict) -> None:
+        """Sets keys of an existing scope object, this is blocking thus
+        needs to be run on an executor.
+        """
+        _to_set = {scope: {_id: data}}
+
         # check object exist
         try:
             scope_class = self.scope_classes.get(scope)
@@ -833,8 +1068,6 @@ class RestAPI:
         except Exception as exc:
             raise web.HTTPBadRequest(reason=str(exc)) from exc
 
-        return web.json_response({"success": True}, headers=MOVAI_RESPONSE_HEADER)
-
     async def delete_in_scope(self, request: web.Request) -> web.Response:
         """ [DELETE] api add keys to scope
             curl -H 'Content-Type: application/json' -X DELETE \
@@ -849,6 +1082,22 @@ class RestAPI:
         if not request.get("user").has_permission(scope, "delete"):
             raise web.HTTPForbidden(reason="User does not have permission.")
 
+        try:
+            data = await request.json()
+            if data and not isinstance(data, dict):
+                raise web.HTTPBadRequest(reason="Invalid data format. Must be json type.")
+        except Exception as exc:
+            LOGGER.warning(f"got an exception while parsing data, see error:{exc}")
+            data = None
+
+        await self._dal.run(self._delete_in_scope, request, scope, _id, data)
+
+        return web.json_response({"success": True}, headers=MOVAI_RESPONSE_HEADER)
+
+    def _delete_in_scope(self, request: web.Request, scope: str, _id: str, data: dict) -> None:
+        """Removes a scope object or some of its keys, this is blocking thus
+        needs to be run on an executor.
+        """
         try:
             scope_class = self.scope_classes.get(scope)
             scope_obj = scope_class(_id)
@@ -859,14 +1108,6 @@ class RestAPI:
         if not scope_obj.has_scope_permission(request.get("user"), "delete"):
             raise web.HTTPForbidden(reason="User does not have permission.")
 
-        try:
-            data = await request.json()
-            if data and not isinstance(data, dict):
-                raise web.HTTPBadRequest(reason="Invalid data format. Must be json type.")
-        except Exception as exc:
-            LOGGER.warning(f"got an exception while parsing data, see error:{exc}")
-            data = None
-
         try:
             if not data:
                 force = request.rel_url.query.get("force")
@@ -877,6 +1118,7 @@ class RestAPI:
             else:
                 # Info to use on middleware
                 request["scope_delete_partial"] = True
+                request["scope_delta"] = {"to_delete": data}
                 scope_obj.remove_partial(data)
                 if not issubclass(self.scope_classes[scope], MovaiBaseModel):
                     try:
@@ -888,8 +1130,6 @@ class RestAPI:
         except Exception as exc:
             raise web.HTTPBadRequest(reason=str(exc))
 
-        return web.json_response({"success": True}, headers=MOVAI_RESPONSE_HEADER)
-
     async def post_to_scope(self, request: web.Request) -> web.Response:
         """ [POST] api add scope structure, do not send name to create
             curl -H 'Content-Type: application/json' -X POST \
@@ -897,7 +1137,6 @@ class RestAPI:
             http://localhost:5003/api/v1/{scope}/{name}/
         """
 
-        obj_created = None  # track if a new object was created
         scope = request.match_info.get("scope")
         _id = request.match_info.get("name", None)
 
@@ -908,6 +1147,19 @@ class RestAPI:
         except Exception:
             raise web.HTTPBadRequest(reason="data is required")
 
+        resp, _id = await self._dal.run(self._post_to_scope, request, scope, _id, data)
+
+        return web.json_response({"success": resp, "name": _id}, headers=MOVAI_RESPONSE_HEADER)
+
+    def _post_to_scope(self, request: web.Request, scope: str, _id: str, data: dict) -> tuple:
+        """Creates or updates a scope object, this is blocking thus needs to
+        be run on an executor.
+
+        Returns:
+            tuple: the result of the write and the object name.
+        """
+        obj_created = None  # track if a new object was created
+
         if not _id:
             # Check User permissions
             if not request.get("user").has_permission(scope, "create"):
@@ -954,9 +1206,13 @@ class RestAPI:
                 raise web.HTTPForbidden(reason="User does not have Scope update permission.")
 
 
+        # Info to use on middleware
+        request["scope_name"] = _id
+
         if issubclass(self.scope_classes[scope], MovaiBaseModel):
             scope_obj.__dict__.update(self.track_scope(request, scope))
             scope_obj.save()
+            request["scope_delta"] = {"to_set": data["data"]}
             resp = True
         else:
             try:
@@ -988,24 +1244,9 @@ class RestAPI:
                     old_dict = {}
 
                 pipe = movai_db.create_pipe()
-
-                deleted = []
-                scope_updates = scope_obj.calc_scope_update(old_dict, new_dict)
-                for scope_obj in scope_updates:
-                    to_delete = scope_obj.get("to_delete")
-                    if to_delete:
-                        if list(to_delete.keys())[0] == "PortsInst" and scope == "Node":
-                            port_name = list(to_delete["PortsInst"].keys())[0]
-                            if port_name not in deleted:
-                                # in case we are deleting a Port from node, then use the regular delete
-                                # in order to delete the exposedPorts from flows
-                                Node(_id).delete("PortsInst", port_name)
-                                deleted.append(port_name)
-                        movai_db.unsafe_delete({scope: {_id: to_delete}}, pipe=pipe)
-
-                    to_set = scope_obj.get("to_set")
-                    if to_set:
-                        movai_db.set({scope: {_id: to_set}}, pipe=pipe)
+                scope_updates = self._pipe_scope_updates(
+                    movai_db, pipe, scope, _id, scope_obj, old_dict, new_dict
+                )
 
                 # Execute
                 resp = True
@@ -1022,7 +1263,230 @@ class RestAPI:
                     movai_db.unsafe_delete({scope: {_id: "*"}})
                 raise web.HTTPBadRequest(reason=str(exc))
 
-        return web.json_response({"success": resp, "name": _id}, headers=MOVAI_RESPONSE_HEADER)
+        return resp, _id
+
+    @staticmethod
+    def _pipe_scope_updates(
+        movai_db: MovaiDB, pipe, scope: str, _id: str, scope_obj, old_dict: dict, new_dict: dict
+    ) -> list:
+        """Calculates the changes between the stored and the new scope data
+        and adds the required sets and deletes to the pipe.
+
+        Args:
+            movai_db (MovaiDB): the db used to write the changes.
+            pipe: the pipe to add the changes to.
+            scope (str): the scope name.
+            _id (str): the object name.
+            scope_obj: the scope object to calculate the changes with.
+            old_dict (dict): the stored scope data.
+            new_dict (dict): the new scope data.
+
+        Returns:
+            list: the scope updates, each one with "to_set" and "to_delete" keys.
+        """
+        deleted = []
+        scope_updates = scope_obj.calc_scope_update(old_dict, new_dict)
+        for update in scope_updates:
+            to_delete = update.get("to_delete")
+            if to_delete:
+                if list(to_delete.keys())[0] == "PortsInst" and scope == "Node":
+                    port_name = list(to_delete["PortsInst"].keys())[0]
+                    if port_name not in deleted:
+                        # in case we are deleting a Port from node, then use the regular delete
+                        # in order to delete the exposedPorts from flows
+                        Node(_id).delete("PortsInst", port_name)
+                        deleted.append(port_name)
+                movai_db.unsafe_delete({scope: {_id: to_delete}}, pipe=pipe)
+
+            to_set = update.get("to_set")
+            if to_set:
+                movai_db.set({scope: {_id: to_set}}, pipe=pipe)
+
+        return scope_updates
+
+    # ---------------------------- BULK IMPORT TO SCOPES -----------------------------
+
+    async def import_scopes(self, request: web.Request) -> web.StreamResponse:
+        """ [POST] api bulk import of scope objects
+            curl -H 'Content-Type: application/x-ndjson' -X POST \
+            --data-binary @objects.ndjson \
+            http://localhost:5003/api/v1/import/
+
+            every line of the body is a json object:
+                {"scope": "Node", "name": "yolo4", "data": {...}}
+
+            the lines are consumed as they arrive and written in batches of
+            IMPORT_BATCH_SIZE objects or IMPORT_BATCH_BYTES bytes, whichever
+            is reached first, for every object a json line is
+            streamed back:
+                {"line": 1, "scope": "Node", "name": "yolo4", "success": true}
+            a line longer than IMPORT_MAX_LINE bytes fails on its own.
+
+            unlike POST /{scope}/{name}/ the import does not run the
+            save_node_type and remove_flow_exposed_port_links middlewares,
+            so the node type is not updated and the flow links of removed
+            node ports are kept.
+        """
+        response = web.StreamResponse(
+            headers={**MOVAI_RESPONSE_HEADER, "Content-Type": "application/x-ndjson"}
+        )
+        await response.prepare(request)
+
+        feed = request.config_dict.get("scope_feed")
+        user = request.get("user")
+        batch = []
+        batch_bytes = 0
+        line_num = 0
+
+        async def flush():
+            results = await self._dal.run(self._import_batch, user, batch)
+            for result in results:
+                delta = result.pop("delta", None)
+                if feed is not None and result["success"]:
+                    feed.publish(result["scope"], result["name"], "update", delta, user.ref)
+            await response.write("".join(json.dumps(result) + "\n" for result in results).encode())
+
+        async for line in read_lines(request.content, IMPORT_MAX_LINE):
+            line_num += 1
+            if line is not None and not line.strip():
+                continue
+            batch.append((line_num, line))
+            batch_bytes += len(line) if line is not None else 0
+            if len(batch) >= IMPORT_BATCH_SIZE or batch_bytes >= IMPORT_BATCH_BYTES:
+                await flush()
+                batch = []
+                batch_bytes = 0
+
+        if batch:
+            await flush()
+
+        await response.write_eof()
+        return response
+
+    def _import_batch(self, user: User, batch: List[Tuple[int, Optional[bytes]]]) -> List[dict]:
+        """Imports a batch of NDJSON lines, all the objects of the old scopes
+        are written with a single pipe. This is blocking thus needs to be
+        run on an executor.
+
+        Args:
+            user (User): the user doing the import.
+            batch (List[Tuple[int, Optional[bytes]]]): the line number and
+                line content, None for a line which is too long.
+
+        Returns:
+            List[dict]: the result of each line, ordered as the batch, the
+                successful ones keep the applied changes in "delta".
+        """
+        movai_db = MovaiDB()
+        pipe = movai_db.create_pipe()
+        results = []
+        piped = []
+        created = []  # deleted if the pipe fails
+        # the data piped for each object, a later line of the same object
+        # is compared with it as the pipe is not executed yet
+        staged = {}
+
+        for line_num, line in batch:
+            result = {"line": line_num, "success": False}
+            results.append(result)
+            obj_created = None
+            try:
+                if line is None:
+                    raise ValueError(f"The line is longer than {IMPORT_MAX_LINE} bytes")
+                obj = json.loads(line)
+                scope = obj["scope"]
+                _id = obj["name"]
+                data = obj["data"]
+                result.update({"scope": scope, "name": _id})
+                if scope not in self.scope_classes:
+                    raise ValueError(f"The requested scope: {scope} could not be found")
+                if not isinstance(data, dict) or not data:
+                    raise ValueError("data is required")
+
+                scope_class = self.scope_classes[scope]
+                if issubclass(scope_class, MovaiBaseModel):
+                    self._import_model(user, scope, _id, data)
+                    result["success"] = True
+                    result["delta"] = [{"to_set": data}]
+                    continue
+
+                try:
+                    scope_obj = scope_class(name=_id)
+                except Exception:
+                    scope_obj = None
+
+                if scope_obj is None:
+                    if not user.has_permission(scope, "create"):
+                        raise PermissionError("User does not have Scope create permission.")
+                    scope_class(_id, new=True)
+                    obj_created = _id
+                    scope_obj = scope_class(name=_id)
+                elif not scope_obj.has_scope_permission(user, "update"):
+                    raise PermissionError("User does not have Scope update permission.")
+
+                new_dict = dict(data)
+                new_dict.update(self.track_scope({"user": user}, scope))
+                old_dict = staged.get((scope, _id))
+                if old_dict is None:
+                    try:
+                        old_dict = movai_db.get({scope: {_id: "**"}}).get(scope).get(_id)
+                    except AttributeError:
+                        old_dict = {}
+
+                result["delta"] = self._pipe_scope_updates(
+                    movai_db, pipe, scope, _id, scope_obj, old_dict, new_dict
+                )
+                staged[(scope, _id)] = new_dict
+                piped.append(result)
+                if obj_created:
+                    created.append((scope, obj_created))
+                    obj_created = None
+            except KeyError as exc:
+                result["error"] = f"{exc} is required"
+            except Exception as exc:
+                result["error"] = str(exc)
+            if obj_created:
+                # an object was created but there was an error
+                movai_db.unsafe_delete({scope: {obj_created: "*"}})
+
+        if piped:
+            try:
+                success = bool(movai_db.execute_pipe(pipe))
+            except Exception as exc:
+                LOGGER.error(f"caught error while executing import pipe, exception: {exc}")
+                success = False
+                for result in piped:
+                    result["error"] = str(exc)
+            for result in piped:
+                result["success"] = success
+            if not success:
+                # the objects created for the batch must be deleted
+                for scope, _id in created:
+                    movai_db.unsafe_delete({scope: {_id: "*"}})
+
+        return results
+
+    def _import_model(self, user: User, scope: str, _id: str, data: dict) -> None:
+        """Creates or updates a single object of a pydantic scope.
+
+        Args:
+            user (User): the user doing the import.
+            scope (str): the scope name.
+            _id (str): the object name.
+            data (dict): the object data.
+        """
+        scope_class = self.scope_classes[scope]
+        try:
+            scope_obj = scope_class(_id)
+            if not scope_obj.has_scope_permission(user, "update"):
+                raise PermissionError("User does not have Scope update permission.")
+            scope_obj.__dict__.update(data)
+        except DoesNotExist:
+            if not user.has_permission(scope, "create"):
+                raise PermissionError("User does not have Scope create permission.")
+            scope_obj = scope_class(**{scope: {_id: data}})
+        scope_obj.__dict__.update(self.track_scope({"user": user}, scope))
+        scope_obj.save()
 
     # ---------------------------- GET CALLBACKS BUILTINS FUNCTIONS --------------------------------
     def create_builtin(self, label: str, builtin: Any) -> dict:
@@ -1086,14 +1550,19 @@ class RestAPI:
         try:
             # validate permissions
             app_name = request.match_info.get("app_name", None)
-            scope_obj = self.scope_classes["Callback"](name=PLACEHOLDER_CB_NAME)
-            if not scope_obj.has_permission(request.get("user"), "execute", app_name):
+            scope_obj = await self._dal.scope(
+                self.scope_classes["Callback"], name=PLACEHOLDER_CB_NAME
+            )
+            if not await scope_obj.has_permission(request.get("user"), "execute", app_name):
                 raise ValueError("User does not have permission")
 
-            callback = GD_Callback(PLACEHOLDER_CB_NAME, "", "")
-            callback.execute({})
-            builtins = callback.user.globals
-            output = {key: self.create_builtin(key, builtins[key]) for key in builtins}
+            def list_builtins():
+                callback = GD_Callback(PLACEHOLDER_CB_NAME, "", "")
+                callback.execute({})
+                builtins = callback.user.globals
+                return {key: self.create_builtin(key, builtins[key]) for key in builtins}
+
+            output = await self._dal.run(list_builtins)
         except Exception as error:
             raise web.HTTPBadRequest(reason=str(error), headers=MOVAI_RESPONSE_HEADER)
 
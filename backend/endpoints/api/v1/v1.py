@@ -26,6 +26,7 @@ from gd_node.protocols.http.middleware import (
     save_node_type,
 )
 
+from backend.core.scope_feed import publish_scope_changes
 from backend.http import IWebApp, WebAppManager
 from backend.endpoints.api.v1.restapi import RestAPI
 
@@ -36,7 +37,7 @@ class RestV1App(IWebApp):
     def __init__(self, app: web.Application):
         super().__init__(app)
         self._node_name = "backend"
-        self._rest_api = RestAPI(self._node_name)
+        self._rest_api = RestAPI(self._node_name, executor=app["executor"])
 
     @property
     def routes(self) -> List[web.RouteDef]:
@@ -49,10 +50,13 @@ class RestV1App(IWebApp):
             web.post(r"/trigger-recovery/", self._rest_api.trigger_recovery),
             web.post(r"/upload/{package_name}/", self._rest_api.upload_static_file),
             web.get(r"/logs/", self._rest_api.get_logs),
+            web.get(r"/logs/export/", self._rest_api.export_logs),
+            web.get(r"/logs/histogram/", self._rest_api.get_logs_histogram),
             web.get(r"/applications/", self._rest_api.get_applications),
             web.get(r"/logs/{robot_name}", self._rest_api.get_robot_logs),
             web.get(r"/metrics/", self._rest_api.get_metrics),
             web.get(r"/apps/{app_name}/{tail:.*}", self._rest_api.get_spa),
+            web.get(r"/database/{scope:(global|fleet)}/", self._rest_api.get_key_values),
             web.get(r"/database/{scope:(global|fleet)}/{key}/", self._rest_api.get_key_value),
             web.post(r"/database/", self._rest_api.set_key_value),
             web.delete(
@@ -62,6 +66,9 @@ class RestV1App(IWebApp):
             web.delete(r"/lock/{name}/", self._rest_api.delete_lock),
             web.post(r"/function/{cb_name}/", self._rest_api.cloud_func),
             web.get(r"/permissions/", self._rest_api.get_permissions),
+            web.get(r"/health/loop-lag/", self._rest_api.get_loop_lag),
+            web.get(r"/health/log-streaming/", self._rest_api.get_log_streaming_stats),
+            web.post(r"/import/", self._rest_api.import_scopes),
             web.get(address_format % REST_SCOPES, self._rest_api.get_scope),
             web.post(address_format % REST_SCOPES, self._rest_api.post_to_scope),
             web.put(address_format % REST_SCOPES, self._rest_api.add_to_scope),
@@ -74,7 +81,12 @@ class RestV1App(IWebApp):
 
     @property
     def middlewares(self) -> List[web.middleware]:
-        return [save_node_type, remove_flow_exposed_port_links, redirect_not_found]
+        return [
+            save_node_type,
+            remove_flow_exposed_port_links,
+            redirect_not_found,
+            publish_scope_changes,
+        ]
 
     @property
     def cors(self) -> aiohttp_cors.CorsConfig:
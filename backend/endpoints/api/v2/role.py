@@ -33,6 +33,17 @@ class RoleRestBaseClass(RestBaseClass, ABC):
         self._scope_name = Role.__name__
         self._scope = self.scope_classes.get(self._scope_name)
 
+    def publish_change(self, name: str, action: str) -> None:
+        """Publishes the Role change to the scope change feed.
+
+        Args:
+            name (str): the name of the Role.
+            action (str): "update" or "delete".
+        """
+        feed = self._request.config_dict.get("scope_feed")
+        if feed is not None:
+            feed.publish(self._scope_name, name, action, user=self._user.ref)
+
     @abstractmethod
     async def execute_imp(self) -> None:
         """This is an abstract method represent the core functionality to
@@ -104,6 +115,7 @@ class PostScope(GetScope):
         role_obj.update_time()
         self._result["success"] = True
         self._result["name"] = data["Label"]
+        self.publish_change(data["Label"], "update")
 
 
 class PutScope(GetScope):
@@ -125,6 +137,7 @@ class PutScope(GetScope):
         self._object.update_time()
         self._result["success"] = True
         self._result["name"] = data["Label"]
+        self.publish_change(self._object_name, "update")
 
 
 class DeleteScope(GetScope):
@@ -141,6 +154,7 @@ class DeleteScope(GetScope):
         Role.remove(self._object_name)
         self._result["success"] = True
         self._result["name"] = self._object_name
+        self.publish_change(self._object_name, "delete")
 
 
 class RoleWebApp(BaseWebApp):
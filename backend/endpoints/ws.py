@@ -12,10 +12,12 @@
 
    Module that implements websockets REST API module/plugin
 """
+import asyncio
+import os
 from typing import List, Union
 
 import aiohttp_cors
-from aiohttp import web
+from aiohttp import WSMsgType, web
 from dal.classes.protocols.wsredissub import WSRedisSub
 from gd_node.protocols.http.middleware import (
     redirect_not_found,
@@ -23,10 +25,36 @@ from gd_node.protocols.http.middleware import (
     save_node_type,
 )
 from gd_node.protocols.http.movai_widget import MovaiWidget
+from movai_core_shared.logger import Log
 
+from backend.core.async_dal import AsyncDAL
 from backend.core.log_streaming.log_client import LogClient
+from backend.core.scope_feed import ScopeChangeFeed
+from backend.core.var_access import VAR_SCOPES
+from backend.core.var_subscriber import VarSubscription, VarSubscriptionHub
+from backend.helpers.rest_helpers import fetch_request_params
 from backend.http import IWebApp, WebAppManager
 
+LOGGER = Log.get_logger(__name__)
+# seconds between the pings which detect the half-open change stream sockets
+HEARTBEAT = float(os.getenv("WS_HEARTBEAT", "30"))
+
+
+async def stop_sender(sender: asyncio.Task) -> None:
+    """Cancels the task sending the changes of a closed socket and logs
+    the error it may have failed with.
+
+    Args:
+        sender (asyncio.Task): the sender task.
+    """
+    sender.cancel()
+    try:
+        await sender
+    except asyncio.CancelledError:
+        pass
+    except Exception as error:
+        LOGGER.error(f"the change stream failed: {error}")
+
 
 async def stream_logs(request: web.Request):
     """Stream logs arriving from message-server to the log_client.
@@ -39,11 +67,128 @@ async def stream_logs(request: web.Request):
     """
     log_streamer = request.config_dict["log_streamer"]
     client = LogClient()
+    client.configure(fetch_request_params(request))
+    client.set_filter_handler(log_streamer.update_client_filter)
     log_streamer.register_client(client)
-    response = await client.run(request)
+    try:
+        response = await client.run(request)
+    finally:
+        log_streamer.unregister_client(client)
     return response
 
 
+async def stream_scope_changes(request: web.Request):
+    """Stream the changes done to scopes, so clients don't need to poll
+    the documents they are showing.
+
+    query parameters (optional, comma separated):
+        scopes: the scopes to receive changes of.
+        names: the object names to receive changes of.
+
+    Args:
+        request (web.Request): The request from the client for websocket connection
+
+    Returns:
+        web.WebSocketResponse: The websocket response to the client.
+    """
+    params = fetch_request_params(request)
+    scopes = [scope for scope in params.get("scopes", "").split(",") if scope]
+    names = [name for name in params.get("names", "").split(",") if name]
+    user = request.get("user")
+    dal = AsyncDAL(request.config_dict["executor"])
+
+    ws_resp = web.WebSocketResponse(heartbeat=HEARTBEAT or None)
+    await ws_resp.prepare(request)
+
+    feed: ScopeChangeFeed = request.config_dict["scope_feed"]
+    subscriber = feed.subscribe(scopes, names)
+    permissions = {}
+
+    async def send_changes():
+        while not ws_resp.closed:
+            event = await subscriber.get()
+            scope = event.get("scope")
+            if scope is not None:
+                if scope not in permissions:
+                    permissions[scope] = await dal.run(user.has_permission, scope, "read")
+                if not permissions[scope]:
+                    continue
+            await ws_resp.send_json(event)
+
+    sender = asyncio.create_task(send_changes())
+    try:
+        async for msg in ws_resp:
+            if msg.type == WSMsgType.TEXT and msg.data == "close":
+                await ws_resp.close()
+    finally:
+        feed.unsubscribe(subscriber)
+        await stop_sender(sender)
+
+    return ws_resp
+
+
+async def stream_vars(request: web.Request):
+    """Stream the changes of global and fleet Vars.
+
+    client messages:
+        {"event": "subscribe", "scope": "fleet", "keys": ["*@pose_goal", "agv1@startTime"]}
+        {"event": "unsubscribe", "scope": "fleet", "keys": ["*@pose_goal"]}
+
+    on subscribe the current values of the matching Vars are sent, then a
+    message is pushed on every change:
+        {"event": "set", "scope": "fleet", "robot": "agv1", "key": "pose_goal", "value": ...}
+    an {"event": "error"} message reports an invalid client message, or
+    changes missed while the Var notifications were interrupted.
+
+    Args:
+        request (web.Request): The request from the client for websocket connection
+
+    Returns:
+        web.WebSocketResponse: The websocket response to the client.
+    """
+    hub: VarSubscriptionHub = request.config_dict["var_hub"]
+
+    ws_resp = web.WebSocketResponse(heartbeat=HEARTBEAT or None)
+    await ws_resp.prepare(request)
+
+    subscription = VarSubscription()
+    hub.register(subscription)
+
+    async def send_changes():
+        while not ws_resp.closed:
+            await ws_resp.send_json(await subscription.get())
+
+    sender = asyncio.create_task(send_changes())
+    try:
+        async for msg in ws_resp:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            if msg.data == "close":
+                await ws_resp.close()
+                continue
+            try:
+                obj = msg.json()
+                event, scope, keys = obj["event"], obj["scope"], obj["keys"]
+                if scope not in VAR_SCOPES:
+                    raise ValueError(f"unsupported scope {scope}")
+                if isinstance(keys, str):
+                    keys = [keys]
+            except Exception as error:
+                await ws_resp.send_json({"event": "error", "error": str(error)})
+                continue
+            if event == "subscribe":
+                subscription.subscribe(scope, keys)
+                for change in await hub.snapshot(scope, keys):
+                    subscription.put(change)
+            elif event == "unsubscribe":
+                subscription.unsubscribe(scope, keys)
+    finally:
+        hub.unregister(subscription)
+        await stop_sender(sender)
+
+    return ws_resp
+
+
 class WSApp(IWebApp):
     """WS app module"""
 
@@ -60,7 +205,9 @@ class WSApp(IWebApp):
         return [
             web.get("/widget/support", self.test_support),
             web.get(self.redis_sub.http_endpoint, self.redis_sub.handler),
-            web.get("/logs", stream_logs)
+            web.get("/logs", stream_logs),
+            web.get("/scopes", stream_scope_changes),
+            web.get("/vars", stream_vars),
         ]
 
     @property
@@ -1,4 +1,7 @@
-from aiohttp import web
+from typing import AsyncIterator, Optional
+from urllib.parse import unquote_plus
+
+from aiohttp import StreamReader, web
 
 def deprecate_endpoint() -> None:
     """This is a helper function to deprecate unused functions
@@ -9,7 +12,8 @@ def deprecate_endpoint() -> None:
     raise web.HTTPForbidden(reason="This endpoint is deprecated")
 
 def fetch_request_params(request: dict) -> dict:
-    """fetches the params from the request and returns them in a dictionary.
+    """fetches the params from the request and returns them in a dictionary,
+    the values are URL decoded.
 
     Args:
         request (dict): The request with the params.
@@ -19,11 +23,44 @@ def fetch_request_params(request: dict) -> dict:
     """
     params = {}
     if request.query_string != "":
-        if "&" in request.query_string:
-            for param in request.query_string.split("&"):
-                name, value = param.split("=")
-                params[name] = value
-        else:
-            name, value = request.query_string.split("=")
-            params[name] = value
-    return params
\ No newline at end of file
+        for param in request.query_string.split("&"):
+            # a value may hold "=", as a regular expression does
+            name, _, value = param.partition("=")
+            params[name] = unquote_plus(value)
+    return params
+
+
+async def read_lines(stream: StreamReader, max_line: int) -> AsyncIterator[Optional[bytes]]:
+    """Yields the lines of a request body as they arrive, without the line
+    ending. Unlike the StreamReader lines, the length of a line is limited
+    by max_line only.
+
+    Args:
+        stream (StreamReader): the request content.
+        max_line (int): the maximal length of a line in bytes.
+
+    Yields:
+        Optional[bytes]: the next line, None for a line longer than
+            max_line, which is skipped.
+    """
+    line = bytearray()
+    oversized = False
+    async for chunk in stream.iter_any():
+        start = 0
+        while start < len(chunk):
+            end = chunk.find(b"\n", start)
+            if not oversized:
+                line += chunk[start:] if end < 0 else chunk[start:end]
+                if len(line) > max_line:
+                    oversized = True
+                    line.clear()
+            if end < 0:
+                break
+            yield None if oversized else bytes(line)
+            line.clear()
+            oversized = False
+            start = end + 1
+    if oversized:
+        yield None
+    elif line:
+        yield bytes(line)
@@ -0,0 +1,89 @@
+"""
+   Copyright (C) Mov.ai  - All Rights Reserved
+   Unauthorized copying of this file, via any medium is strictly prohibited
+   Proprietary and confidential
+
+   Usage:
+        Benchmarks the compiled log filters of the live log stream, every
+        message is evaluated against the filter of every client:
+
+            python -m backend.tools.log_filter_bench --clients 50 --rate 10000
+
+        The messages are plain objects with the LogRequest attributes used
+        by the filters, so the decoding cost is not part of the benchmark.
+"""
+import argparse
+import random
+import time
+from types import SimpleNamespace
+
+from backend.core.log_streaming.log_filter import LogFilter
+
+ROBOTS = [f"robot{i}" for i in range(20)]
+SERVICES = ["spawner", "backend", "message-server", "ros-tools", "health-node"]
+LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+WORDS = ["started", "stopped", "timeout", "connected", "navigation", "battery", "failed"]
+
+
+def make_messages(count: int) -> list:
+    now = time.time()
+    messages = []
+    for i in range(count):
+        tags = SimpleNamespace(
+            robot=random.choice(ROBOTS),
+            service=random.choice(SERVICES),
+            level=random.choice(LEVELS),
+        )
+        text = " ".join(random.choices(WORDS, k=6)) + f" #{i}"
+        req_data = SimpleNamespace(log_tags=tags, log_fields=SimpleNamespace(message=text))
+        messages.append(SimpleNamespace(req_data=req_data, created=now - random.random() * 3600))
+    return messages
+
+
+def make_filters(count: int) -> list:
+    now = time.time()
+    templates = [
+        lambda: {},
+        lambda: {"robots": ",".join(random.sample(ROBOTS, 3))},
+        lambda: {"levels": "ERROR,CRITICAL", "exclude_services": "ros-tools"},
+        lambda: {"robot": random.choice(ROBOTS), "message": random.choice(WORDS)},
+        lambda: {"message_regex": r"(timeout|failed) .*battery", "fromDate": now - 600},
+        lambda: {"services": "spawner,backend", "fromDate": now - 1800, "toDate": now},
+        lambda: {"exclude_levels": "DEBUG", "tags": f"service:{random.choice(SERVICES)}"},
+    ]
+    return [LogFilter(**templates[i % len(templates)]()) for i in range(count)]
+
+
+def run(clients: int, messages: int, rate: int) -> None:
+    filters = make_filters(clients)
+    msgs = make_messages(messages)
+    predicates = [log_filter.filter_msg for log_filter in filters]
+
+    passed = 0
+    start = time.perf_counter()
+    for msg in msgs:
+        for predicate in predicates:
+            if predicate(msg):
+                passed += 1
+    elapsed = time.perf_counter() - start
+
+    per_msg = elapsed / messages
+    print(f"clients: {clients}, messages: {messages}, delivered: {passed}")
+    print(f"total: {elapsed * 1000:.1f}ms, per message (all clients): {per_msg * 1e6:.2f}us")
+    print(f"max rate: {1 / per_msg:,.0f} msgs/s")
+    print(f"loop time used at {rate:,} msgs/s: {per_msg * rate * 100:.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the live log stream filters")
+    parser.add_argument("--clients", type=int, default=50, help="number of clients")
+    parser.add_argument("--messages", type=int, default=10000, help="number of messages")
+    parser.add_argument("--rate", type=int, default=10000, help="target msgs/s")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+    random.seed(args.seed)
+    run(args.clients, args.messages, args.rate)
+
+
+if __name__ == "__main__":
+    main()
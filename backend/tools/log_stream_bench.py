@@ -0,0 +1,251 @@
+"""
+   Copyright (C) Mov.ai  - All Rights Reserved
+   Unauthorized copying of this file, via any medium is strictly prohibited
+   Proprietary and confidential
+
+   Usage:
+        Load test of the live log stream of a running backend, a local ZMQ
+        PUB socket stands in for the message-server log publisher and
+        websocket clients with mixed filters read the stream.
+
+        Start the backend with its log streamer connected to the stand-in:
+
+            LOG_STREAMER_ZMQ_ADDR=tcp://localhost:5560 backend
+
+        then run:
+
+            python -m backend.tools.log_stream_bench --token <jwt> --clients 50 \\
+                --rate 5000 --duration 30 --backend-pid <pid>
+
+        Every message carries the time it was published, the report has the
+        end to end latency percentiles, the messages delivered and dropped
+        per client filter and the CPU used by the backend process. With a
+        superuser token the log streaming stats of the backend are shown too.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import re
+import time
+from typing import List, Optional
+
+import aiohttp
+import zmq
+
+from backend.tools.log_filter_bench import LEVELS, ROBOTS, SERVICES, WORDS
+
+PUBLISHER_ADDR = "tcp://*:5560"
+WARMUP = 1.0  # seconds for the backend subscriber to connect before publishing
+DRAIN = 5.0  # seconds to receive the buffered messages after publishing
+SEND_HWM = 1000000  # messages queued by the publisher before dropping
+TIME_MARK = re.compile(r"sent:(\d+\.\d+)")
+FILTERS = [
+    {},
+    {"levels": "ERROR,CRITICAL"},
+    {"robots": ",".join(ROBOTS[:3])},
+    {"services": "spawner", "exclude_levels": "DEBUG"},
+    {"message_regex": "(timeout|failed)"},
+    {"robot": ROBOTS[3], "batch_size": "100", "batch_ms": "50"},
+]
+
+
+def make_payload(robot: str, service: str, level: str, message: str) -> dict:
+    """Builds a LogRequest payload like the ones published by the message-server."""
+    return {
+        "req_type": "logs",
+        "created": int(time.time()),
+        "response_required": False,
+        "req_data": {
+            "measurement": "app_logs",
+            "log_tags": {"robot": robot, "service": service, "level": level},
+            "log_fields": {
+                "module": "log_stream_bench",
+                "funcName": "publish",
+                "lineno": 0,
+                "message": message,
+            },
+        },
+    }
+
+
+def publish(addr: str, rate: int, duration: float, size: int, sent) -> None:
+    """Publishes synthetic log messages at rate msgs/s, runs in its own
+    process so the publisher does not compete with the clients.
+
+    Args:
+        addr (str): the address the PUB socket binds to.
+        rate (int): the messages per second.
+        duration (float): the seconds to publish for.
+        size (int): the characters of padding added to every message.
+        sent (multiprocessing.Value): the number of messages published.
+    """
+    context = zmq.Context()
+    socket = context.socket(zmq.PUB)
+    socket.setsockopt(zmq.SNDHWM, SEND_HWM)
+    socket.bind(addr)
+    # a subscriber connecting late misses the first messages
+    time.sleep(WARMUP)
+    padding = "x" * size
+    count = 0
+    start = time.perf_counter()
+    while True:
+        elapsed = time.perf_counter() - start
+        if elapsed >= duration:
+            break
+        while count < int(elapsed * rate):
+            message = f"{random.choice(WORDS)} sent:{time.time():.6f} {padding}"
+            payload = make_payload(
+                random.choice(ROBOTS), random.choice(SERVICES), random.choice(LEVELS), message
+            )
+            # the subscriber decodes the last frame of a message
+            socket.send_multipart([json.dumps(payload).encode()])
+            count += 1
+        time.sleep(0.001)
+    sent.value = count
+    socket.close(linger=1000)
+    context.term()
+
+
+class ClientStats:
+    """The counters of a websocket client."""
+
+    def __init__(self, params: dict) -> None:
+        self.params = params
+        self.connected = False
+        self.delivered = 0
+        self.dropped = 0
+        self.frames = 0
+        self.latencies: List[float] = []
+
+
+async def read_stream(session: aiohttp.ClientSession, url: str, stats: ClientStats) -> None:
+    """Reads the log stream until cancelled, the publish time of every
+    message gives its latency.
+    """
+    async with session.ws_connect(url, params=stats.params) as ws:
+        stats.connected = True
+        async for msg in ws:
+            if msg.type != aiohttp.WSMsgType.TEXT:
+                continue
+            received = time.time()
+            stats.frames += 1
+            if msg.data.startswith('{"event"'):
+                event = json.loads(msg.data)
+                if event.get("event") == "dropped":
+                    stats.dropped += event["count"]
+                continue
+            for sent in TIME_MARK.findall(msg.data):
+                stats.latencies.append(received - float(sent))
+                stats.delivered += 1
+
+
+def cpu_time(pid: int) -> float:
+    """Returns the user and system CPU seconds used by a process."""
+    with open(f"/proc/{pid}/stat") as stat:
+        # the command may hold spaces, the fields follow its closing parenthesis
+        fields = stat.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def percentile(values: List[float], ratio: float) -> float:
+    return values[min(int(len(values) * ratio), len(values) - 1)] if values else 0.0
+
+
+async def fetch_streaming_stats(session: aiohttp.ClientSession, url: str) -> Optional[dict]:
+    async with session.get(f"{url}/api/v1/health/log-streaming/") as response:
+        if response.status != 200:
+            return None
+        return await response.json()
+
+
+async def run(args: argparse.Namespace) -> None:
+    ws_url = re.sub(r"^http", "ws", args.url) + "/ws/logs"
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    clients = []
+    for i in range(args.clients):
+        params = dict(FILTERS[i % len(FILTERS)], buffer=str(args.buffer))
+        if args.token:
+            params["token"] = args.token
+        clients.append(ClientStats(params))
+
+    async with aiohttp.ClientSession(headers=headers) as session:
+        tasks = [asyncio.create_task(read_stream(session, ws_url, stats)) for stats in clients]
+        while not all(stats.connected for stats in clients):
+            failed = [task for task in tasks if task.done()]
+            if failed:
+                failed[0].result()
+            await asyncio.sleep(0.1)
+
+        sent = multiprocessing.Value("l", 0)
+        publisher = multiprocessing.Process(
+            target=publish, args=(args.pub_addr, args.rate, args.duration, args.size, sent)
+        )
+        publisher.start()
+        await asyncio.sleep(WARMUP)
+        cpu_start = cpu_time(args.backend_pid) if args.backend_pid else None
+        start = time.perf_counter()
+        while publisher.is_alive():
+            await asyncio.sleep(0.1)
+        await asyncio.sleep(args.drain)
+        elapsed = time.perf_counter() - start
+        cpu_used = cpu_time(args.backend_pid) - cpu_start if args.backend_pid else None
+        streaming_stats = await fetch_streaming_stats(session, args.url) if args.token else None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    print(
+        f"published: {sent.value} msgs in {args.duration}s ({sent.value / args.duration:,.0f} msgs/s)"
+    )
+    print(f"clients: {args.clients}")
+    for index, log_filter in enumerate(FILTERS):
+        group = clients[index :: len(FILTERS)]
+        if not group:
+            continue
+        delivered = sum(stats.delivered for stats in group)
+        dropped = sum(stats.dropped for stats in group)
+        print(
+            f"  {log_filter or 'no filter'} x{len(group)}: delivered {delivered}, dropped {dropped}"
+        )
+    latencies = sorted(latency for stats in clients for latency in stats.latencies)
+    print(
+        f"delivered: {len(latencies)}, dropped: {sum(stats.dropped for stats in clients)}, "
+        f"frames: {sum(stats.frames for stats in clients)}"
+    )
+    print(
+        "latency ms: "
+        + ", ".join(
+            f"{name} {percentile(latencies, ratio) * 1000:.1f}"
+            for name, ratio in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1))
+        )
+    )
+    if cpu_used is not None:
+        print(f"backend cpu: {cpu_used:.1f}s, {cpu_used / elapsed * 100:.0f}% of a core")
+    if streaming_stats is not None:
+        streaming_stats.pop("clients", None)
+        print(f"log streaming stats: {json.dumps(streaming_stats)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the live log stream")
+    parser.add_argument("--url", default="http://localhost:5004", help="the backend url")
+    parser.add_argument("--token", help="the access token of the clients")
+    parser.add_argument("--clients", type=int, default=50, help="number of websocket clients")
+    parser.add_argument("--rate", type=int, default=5000, help="published msgs/s")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to publish for")
+    parser.add_argument("--size", type=int, default=100, help="padding chars per message")
+    parser.add_argument("--buffer", type=int, default=1000, help="client buffer size")
+    parser.add_argument("--drain", type=float, default=DRAIN, help="seconds to wait after")
+    parser.add_argument("--pub-addr", default=PUBLISHER_ADDR, help="the PUB socket address")
+    parser.add_argument("--backend-pid", type=int, help="the backend pid, to measure its CPU")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+    random.seed(args.seed)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,11 @@ requirements = [
     "gd-node==2.5.0.7",
 ]
 
+extras_require = {
+    # the msgpack format of the live log stream
+    "msgpack": ["msgpack==1.0.5"],
+}
+
 
 setuptools.setup(
     name="backend",
@@ -32,6 +37,7 @@ setuptools.setup(
     include_package_data=True,
     classifiers=["Programming Language :: Python :: 3"],
     install_requires=[requirements],
+    extras_require=extras_require,
     entry_points={
         "console_scripts": [
             "backend = backend:main",
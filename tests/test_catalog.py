@@ -0,0 +1,54 @@
+import asyncio
+import threading
+import unittest
+
+import mock
+
+from backend.core.async_dal import AsyncDAL
+from backend.core.catalog import ApplicationCatalog
+
+
+class TestApplicationCatalog(unittest.TestCase):
+    def test_invalidate_during_build(self):
+        started = threading.Event()
+        release = threading.Event()
+        builds = []
+
+        def build() -> dict:
+            builds.append(None)
+            number = len(builds)
+            if number == 1:
+                started.set()
+                release.wait(1)
+            return {"build": number}
+
+        async def run(catalog: ApplicationCatalog, dal: AsyncDAL) -> tuple:
+            stale = asyncio.ensure_future(catalog.get(dal))
+            await asyncio.get_running_loop().run_in_executor(None, started.wait, 1)
+            catalog.invalidate()
+            fresh = await catalog.get(dal)
+            release.set()
+            return await stale, fresh, await catalog.get(dal)
+
+        catalog = ApplicationCatalog()
+        with mock.patch.object(ApplicationCatalog, "_build", staticmethod(build)):
+            stale, fresh, cached = asyncio.run(run(catalog, AsyncDAL()))
+        self.assertEqual(stale, {"build": 1})
+        self.assertEqual(fresh, {"build": 2})
+        self.assertEqual(cached, {"build": 2})
+        self.assertEqual(len(builds), 2)
+
+    def test_concurrent_callers_share_build(self):
+        builds = []
+
+        def build() -> dict:
+            builds.append(None)
+            return {"build": len(builds)}
+
+        async def run(catalog: ApplicationCatalog, dal: AsyncDAL) -> list:
+            return await asyncio.gather(*(catalog.get(dal) for _ in range(5)))
+
+        with mock.patch.object(ApplicationCatalog, "_build", staticmethod(build)):
+            results = asyncio.run(run(ApplicationCatalog(), AsyncDAL()))
+        self.assertEqual(results, [{"build": 1}] * 5)
+        self.assertEqual(len(builds), 1)
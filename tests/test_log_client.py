@@ -0,0 +1,156 @@
+import asyncio
+import json
+import unittest
+from types import SimpleNamespace
+
+from backend.core.log_streaming.log_client import LogClient
+from backend.core.log_streaming.log_record import MSGPACK, LogRecord
+
+if MSGPACK:
+    import msgpack
+
+
+def make_record(seq: int) -> LogRecord:
+    log_format = {"message": f"m{seq}", "level": "INFO"}
+    request = SimpleNamespace(get_client_log_format=lambda: log_format)
+    return LogRecord(request, seq)
+
+
+def make_client(**params) -> LogClient:
+    client = LogClient()
+    client.configure(params)
+    return client
+
+
+def buffered_frames(client: LogClient) -> list:
+    frames = []
+    while client.buffered:
+        frames.extend(frame for frame, _ in client._pop_frames(client.buffered))
+    return [json.loads(frame) for frame in frames]
+
+
+class TestLogClientBuffer(unittest.TestCase):
+    def test_drop_oldest_keeps_control_events(self):
+        client = make_client(buffer="10")
+        client.push_event({"event": "gap", "from": 1, "to": 5})
+        for seq in range(20):
+            client.push(make_record(seq))
+        self.assertEqual(client.buffered, 10)
+        self.assertEqual(client.dropped, 11)
+        frames = buffered_frames(client)
+        self.assertEqual(frames[0]["event"], "gap")
+        self.assertEqual([frame["seq"] for frame in frames[1:]], list(range(11, 20)))
+        self.assertEqual(client.buffered_bytes, 0)
+
+    def test_drop_newest(self):
+        client = make_client(buffer="10", overflow="drop-newest")
+        for seq in range(15):
+            client.push(make_record(seq))
+        self.assertEqual(client.dropped, 5)
+        self.assertEqual([frame["seq"] for frame in buffered_frames(client)], list(range(10)))
+
+    def test_downgrade_keeps_control_events(self):
+        client = make_client(buffer="100")
+        client.push_event({"event": "filter", "filter": {}})
+        for seq in range(60):
+            client.push(make_record(seq))
+        self.assertGreater(client.downgrade(), 0)
+        self.assertEqual(client.buffer_size, 30)
+        self.assertEqual(client.buffered, 30)
+        frames = buffered_frames(client)
+        self.assertEqual(frames[0]["event"], "filter")
+        self.assertEqual(frames[-1], {"event": "downgraded", "buffer": 30})
+
+
+def make_log_request(message: str = "hello") -> SimpleNamespace:
+    tags = SimpleNamespace(robot="robot1", service="spawner", level="INFO")
+    return SimpleNamespace(
+        created=1.0,
+        req_data=SimpleNamespace(log_tags=tags, log_fields=SimpleNamespace(message=message)),
+        get_client_log_format=lambda: {"message": message},
+    )
+
+
+@unittest.skipUnless(MSGPACK, "msgpack is not installed")
+class TestLogClientMsgpack(unittest.TestCase):
+    def test_names_frame_decodes(self):
+        client = make_client(format="msgpack")
+        client.push(LogRecord(make_log_request(), 1))
+        client.push(LogRecord(make_log_request(), 2))
+        frames = [msgpack.unpackb(frame) for frame, _ in client._pop_frames(2)]
+        self.assertEqual(len(frames), 3)
+        names = frames[0]["names"]
+        self.assertEqual(set(names.values()), {"robot1", "spawner"})
+        self.assertEqual(names[str(frames[1][2])], "robot1")
+        self.assertEqual(names[str(frames[1][3])], "spawner")
+
+
+class FailingSocket:
+    closed = False
+
+    def __init__(self) -> None:
+        self.sent = []
+
+    async def send_bytes(self, frame: bytes) -> None:
+        self.sent.append(frame)
+        raise ConnectionResetError("Cannot write to closing transport")
+
+    send_str = send_bytes
+
+
+class RecordingSocket:
+    closed = False
+
+    def __init__(self) -> None:
+        self.sent = []
+
+    async def send_str(self, frame: str) -> None:
+        self.sent.append(frame)
+
+
+class TestLogClientDelivered(unittest.TestCase):
+    def stream(self, **params) -> LogClient:
+        async def run() -> LogClient:
+            client = make_client(buffer="10", **params)
+            client._ws = RecordingSocket()
+            client.push_event({"event": "filter", "filter": {}})
+            for seq in range(15):
+                client.push(make_record(seq))
+            task = asyncio.create_task(client.stream_msgs())
+            while client.buffered:
+                await asyncio.sleep(0.01)
+            client.evict("done")
+            await asyncio.wait_for(task, 1)
+            return client
+
+        return asyncio.run(run())
+
+    def test_counts_sent_messages(self):
+        client = self.stream()
+        stats = client.stats()
+        self.assertEqual((stats["received"], stats["dropped"]), (15, 6))
+        self.assertEqual(stats["delivered"], 9)
+        # the dropped and filter events are not messages
+        self.assertEqual(stats["frames_sent"], 11)
+
+    def test_counts_batched_messages(self):
+        client = self.stream(batch_size="4", batch_ms="10")
+        stats = client.stats()
+        self.assertEqual(stats["delivered"], 9)
+        self.assertEqual(sum(len(json.loads(frame)) for frame in client._ws.sent[1:]), 10)
+
+
+class TestLogClientEviction(unittest.TestCase):
+    @unittest.skipUnless(MSGPACK, "msgpack is not installed")
+    def test_stream_stops_after_eviction(self):
+        async def run() -> LogClient:
+            client = make_client(format="msgpack")
+            client._ws = FailingSocket()
+            client.push(LogRecord(make_log_request(), 1))
+            await asyncio.wait_for(client.stream_msgs(), 1)
+            return client
+
+        client = asyncio.run(run())
+        self.assertFalse(client.is_alive())
+        # the names frame failed, the record frame was not sent
+        self.assertEqual(len(client._ws.sent), 1)
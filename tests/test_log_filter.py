@@ -0,0 +1,137 @@
+import unittest
+from types import SimpleNamespace
+
+import mock
+
+from backend.core.log_streaming.log_client import LogClient
+from backend.core.log_streaming.log_filter import LogFilter
+from backend.core.log_streaming.log_streamer import LogStreamer
+from backend.helpers.rest_helpers import fetch_request_params
+
+
+def make_msg(robot="robot1", service="spawner", level="INFO", message="hello", created=100.0):
+    tags = SimpleNamespace(robot=robot, service=service, level=level)
+    req_data = SimpleNamespace(log_tags=tags, log_fields=SimpleNamespace(message=message))
+    return SimpleNamespace(req_data=req_data, created=created)
+
+
+def make_client(**params) -> LogClient:
+    client = LogClient()
+    client.configure(params)
+    return client
+
+
+class TestLogFilter(unittest.TestCase):
+    def test_no_filter_passes_all(self):
+        self.assertTrue(LogFilter().filter_msg(make_msg()))
+        self.assertTrue(LogFilter(robots="", message=None).filter_msg(make_msg()))
+
+    def test_tags(self):
+        log_filter = LogFilter(robots="robot1,robot2", levels=["ERROR"])
+        self.assertTrue(log_filter.filter_msg(make_msg(level="ERROR")))
+        self.assertFalse(log_filter.filter_msg(make_msg(level="INFO")))
+        self.assertFalse(log_filter.filter_msg(make_msg(robot="robot3", level="ERROR")))
+
+    def test_exclude_tags(self):
+        log_filter = LogFilter(exclude_levels="DEBUG", exclude_tags="service:spawner")
+        self.assertTrue(log_filter.filter_msg(make_msg(service="backend")))
+        self.assertFalse(log_filter.filter_msg(make_msg(service="spawner")))
+        self.assertFalse(log_filter.filter_msg(make_msg(service="backend", level="DEBUG")))
+
+    def test_message(self):
+        log_filter = LogFilter(message="battery low")
+        self.assertTrue(log_filter.filter_msg(make_msg(message="the battery low alarm")))
+        self.assertFalse(log_filter.filter_msg(make_msg(message="battery is low")))
+
+    def test_message_regex(self):
+        log_filter = LogFilter(message_regex="(timeout|failed)")
+        self.assertTrue(log_filter.filter_msg(make_msg(message="timeout x")))
+        self.assertFalse(log_filter.filter_msg(make_msg(message="connected")))
+
+    def test_dates(self):
+        log_filter = LogFilter(fromDate="100", toDate=200)
+        self.assertTrue(log_filter.filter_msg(make_msg(created=100)))
+        self.assertFalse(log_filter.filter_msg(make_msg(created=200)))
+
+    def test_invalid_values(self):
+        with self.assertRaises(ValueError):
+            LogFilter(message_regex="(")
+        with self.assertRaises(ValueError):
+            LogFilter(tags="service")
+        with self.assertRaises(ValueError):
+            LogFilter(fromDate="yesterday")
+
+    def test_equivalent_filters_share_key(self):
+        self.assertEqual(LogFilter(robot="r1,r2").key, LogFilter(robots=" r2, r1").key)
+        self.assertEqual(LogFilter(levels="ERROR").key, LogFilter(LEVELS=["ERROR"]).key)
+        self.assertNotEqual(LogFilter(levels="ERROR").key, LogFilter(exclude_levels="ERROR").key)
+        self.assertNotEqual(LogFilter().key, LogFilter(message="x").key)
+
+    def test_allowed_tags(self):
+        log_filter = LogFilter(robots="r1,r2", robot="r2,r3")
+        self.assertEqual(log_filter.robots, frozenset({"r2"}))
+        self.assertIsNone(log_filter.levels)
+
+    def test_request_params_are_decoded(self):
+        request = SimpleNamespace(
+            query_string="message_regex=(timeout%7Cfailed)&message=battery+low&x=a=b"
+        )
+        params = fetch_request_params(request)
+        self.assertEqual(params["message_regex"], "(timeout|failed)")
+        self.assertEqual(params["message"], "battery low")
+        self.assertEqual(params["x"], "a=b")
+        self.assertTrue(LogFilter(**params).filter_msg(make_msg(message="battery low timeout")))
+
+
+@mock.patch("backend.core.log_streaming.log_streamer.ZMQManager", mock.MagicMock())
+class TestLogStreamerGroups(unittest.TestCase):
+    def matched(self, streamer: LogStreamer, **tags) -> set:
+        return {
+            client_id
+            for key in streamer._match_groups(make_msg(**tags))
+            for client_id in streamer._groups[key].clients
+        }
+
+    def test_clients_with_equal_filters_share_group(self):
+        streamer = LogStreamer()
+        first, second = make_client(robots="r1,r2"), make_client(robot="r2,r1")
+        streamer.register_client(first)
+        streamer.register_client(second)
+        streamer.register_client(make_client(levels="ERROR"))
+        self.assertEqual(len(streamer._groups), 2)
+        streamer.unregister_client(first)
+        streamer.unregister_client(second)
+        self.assertEqual(len(streamer._groups), 1)
+
+    def test_tag_index(self):
+        streamer = LogStreamer()
+        robot = make_client(robots="r1")
+        error = make_client(levels="ERROR")
+        any_client = make_client(message="x")
+        excluded = make_client(exclude_robots="r1")
+        for client in (robot, error, any_client, excluded):
+            streamer.register_client(client)
+
+        self.assertEqual(
+            self.matched(streamer, robot="r1", level="ERROR"),
+            {robot.id, error.id, any_client.id, excluded.id},
+        )
+        self.assertEqual(
+            self.matched(streamer, robot="r2", level="INFO"), {any_client.id, excluded.id}
+        )
+
+    def test_index_cleanup(self):
+        streamer = LogStreamer()
+        client = make_client(robots="r1", levels="ERROR")
+        streamer.register_client(client)
+        streamer.unregister_client(client)
+        self.assertEqual(self.matched(streamer, robot="r1", level="ERROR"), set())
+        self.assertTrue(all(not index for index in streamer._index.values()))
+
+    def test_filter_update_moves_client(self):
+        streamer = LogStreamer()
+        client = make_client(robots="r1")
+        streamer.register_client(client)
+        streamer.update_client_filter(client, LogFilter(robots="r2"))
+        self.assertEqual(self.matched(streamer, robot="r1"), set())
+        self.assertEqual(self.matched(streamer, robot="r2"), {client.id})
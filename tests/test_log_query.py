@@ -0,0 +1,155 @@
+import asyncio
+import unittest
+
+import mock
+
+from backend.core.log_query import (
+    MAX_ROBOT_QUERY_DEPTH,
+    date_params,
+    decode_cursor,
+    export_logs,
+    get_logs_per_robot,
+    log_histogram,
+)
+from backend.core.query_cache import QueryCache
+
+
+class FakeLogsQuery:
+    """Serves the logs newest first, bounded by fromDate and toDate and
+    filtered by robots.
+    """
+
+    def __init__(self, logs: list) -> None:
+        self.logs = sorted(logs, key=lambda log: log["time"], reverse=True)
+        self.queries = []
+
+    async def get_logs(self, pagination=False, **params):
+        self.queries.append(params)
+        logs = [
+            log
+            for log in self.logs
+            if params.get("fromDate") is None or log["time"] >= params["fromDate"]
+            if params.get("toDate") is None or log["time"] < params["toDate"]
+            if params.get("robots") is None or log.get("robot") == params["robots"]
+        ]
+        offset = int(params.get("offset", 0))
+        limit = int(params.get("limit", 1000))
+        page = logs[offset : offset + limit]
+        return {
+            "data": [dict(log) for log in page],
+            "size": len(logs),
+            "limit": limit,
+            "offset": offset,
+            "version": 1,
+        }
+
+
+def make_logs(count: int, start: float, step: float) -> list:
+    levels = ["INFO", "ERROR"]
+    return [
+        {"time": start + i * step, "level": levels[i % 2], "message": f"m{i}"} for i in range(count)
+    ]
+
+
+class TestExportLogs(unittest.TestCase):
+    def export(self, fake: FakeLogsQuery, params: dict, cursor=None, page_size=4) -> list:
+        async def collect():
+            return [page async for page in export_logs(params, cursor, page_size)]
+
+        with mock.patch("backend.core.log_query.LogsQuery", fake):
+            return asyncio.run(collect())
+
+    def test_cursor_advances(self):
+        # pairs of logs share a time, the pages split some of them
+        logs = make_logs(10, 0.0, 1) + [
+            dict(log, id=i) for i, log in enumerate(make_logs(10, 0.0, 1))
+        ]
+        fake = FakeLogsQuery(logs)
+        pages = self.export(fake, {"from": 2.0, "limit": 3, "offset": 5}, page_size=5)
+        exported = [log for page in pages for log in page]
+        self.assertEqual(len(exported), 16)
+        self.assertEqual(len({log["cursor"] for log in exported}), 16)
+        self.assertEqual(
+            [log["time"] for log in exported],
+            sorted((log["time"] for log in exported), reverse=True),
+        )
+        self.assertTrue(all(query["fromDate"] == 2.0 for query in fake.queries))
+        self.assertTrue(all("from" not in query for query in fake.queries))
+        self.assertTrue(all(query["offset"] == 0 for query in fake.queries))
+        to_dates = [query.get("toDate") for query in fake.queries]
+        self.assertIsNone(to_dates[0])
+        self.assertEqual(to_dates[1:], sorted(to_dates[1:], reverse=True))
+
+    def test_resume_from_cursor(self):
+        logs = make_logs(10, 0.0, 1)
+        first = self.export(FakeLogsQuery(logs), {})[0]
+        resumed = self.export(FakeLogsQuery(logs), {"to": 100}, first[-1]["cursor"])
+        self.assertEqual(resumed[0][0]["time"], first[-1]["time"] - 1)
+        self.assertEqual(decode_cursor(resumed[-1][-1]["cursor"])[0], 0.0)
+
+    def test_resume_inside_same_time_logs(self):
+        # 3 logs share every time
+        logs = [dict(log, id=i) for i, log in enumerate(make_logs(15, 0.0, 1))]
+        for log in logs:
+            log["time"] = float(log["id"] // 3)
+        exported = [log for page in self.export(FakeLogsQuery(logs), {}) for log in page]
+        self.assertEqual(len(exported), 15)
+        for index, log in enumerate(exported):
+            resumed = self.export(FakeLogsQuery(logs), {}, log["cursor"])
+            rest = [item["id"] for page in resumed for item in page]
+            self.assertEqual(rest, [item["id"] for item in exported[index + 1 :]], index)
+
+    def test_date_aliases(self):
+        params = date_params({"from": 1, "to_": 2, "robots": "r1"})
+        self.assertEqual(params, {"fromDate": 1, "toDate": 2, "robots": "r1"})
+
+
+class TestLogHistogram(unittest.TestCase):
+    def histogram(self, logs: list, from_: float, to: float, bucket: float) -> list:
+        with mock.patch("backend.core.log_query.LogsQuery", FakeLogsQuery(logs)):
+            return asyncio.run(log_histogram({}, from_, to, bucket, QueryCache(3600, 1000)))
+
+    def test_fractional_buckets_count_all_logs(self):
+        logs = make_logs(3000, 1000.0, 0.001)
+        for bucket in (0.1, 0.3, 1):
+            buckets = self.histogram(logs, 1000.0, 1003.0, bucket)
+            self.assertEqual(sum(item["total"] for item in buckets), 3000, bucket)
+            self.assertEqual(len(buckets), len({item["start"] for item in buckets}))
+
+    def test_counts_per_level(self):
+        buckets = self.histogram(make_logs(10, 60.0, 10), 60.0, 180.0, 60)
+        self.assertEqual([item["start"] for item in buckets], [60.0, 120.0])
+        self.assertEqual(buckets[0]["counts"], {"INFO": 3, "ERROR": 3})
+        self.assertEqual(buckets[1]["total"], 4)
+
+    def test_queries_use_logs_query_dates(self):
+        fake = FakeLogsQuery(make_logs(10, 60.0, 10))
+        with mock.patch("backend.core.log_query.LogsQuery", fake):
+            asyncio.run(log_histogram({"from": 0}, 60.0, 180.0, 60, QueryCache(3600, 1000)))
+        self.assertTrue(fake.queries)
+        for query in fake.queries:
+            self.assertEqual(query["fromDate"], 60.0)
+            self.assertNotIn("from", query)
+
+    def test_too_many_buckets(self):
+        with self.assertRaises(ValueError):
+            self.histogram([], 0, 10**6, 0.001)
+
+
+class TestLogsPerRobot(unittest.TestCase):
+    def logs(self, params: dict) -> dict:
+        logs = [dict(log, robot="r1") for log in make_logs(10, 0.0, 1)]
+        logs += [dict(log, robot="r2") for log in make_logs(10, 0.5, 1)]
+        with mock.patch("backend.core.log_query.LogsQuery", FakeLogsQuery(logs)):
+            return asyncio.run(get_logs_per_robot(params, ["r1", "r2"]))
+
+    def test_merged_page(self):
+        output = self.logs({"limit": 4, "offset": 2})
+        self.assertEqual([log["time"] for log in output["data"]], [8.5, 8.0, 7.5, 7.0])
+        self.assertEqual(output["size"], 20)
+        self.assertEqual((output["limit"], output["offset"]), (4, 2))
+        self.assertEqual(output["version"], 1)
+
+    def test_deep_page(self):
+        with self.assertRaises(ValueError):
+            self.logs({"limit": 10, "offset": MAX_ROBOT_QUERY_DEPTH})
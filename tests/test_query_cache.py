@@ -0,0 +1,42 @@
+import asyncio
+import unittest
+
+from backend.core.query_cache import QueryCache
+
+
+class TestQueryCache(unittest.TestCase):
+    def test_equivalent_params_share_key(self):
+        self.assertEqual(
+            QueryCache.make_key("logs", {"robots": "r1,r2", "message": "battery%20low"}),
+            QueryCache.make_key("logs", {"message": "battery low", "robots": " r2,r1"}),
+        )
+
+    def test_stats(self):
+        calls = []
+
+        async def query():
+            calls.append(None)
+            await asyncio.sleep(0.01)
+            return {"data": []}
+
+        async def run(cache: QueryCache) -> None:
+            await asyncio.gather(*(cache.get("key", query) for _ in range(3)))
+            await cache.get("key", query)
+
+        cache = QueryCache(60, 10)
+        asyncio.run(run(cache))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(
+            cache.stats(), {"entries": 1, "inflight": 0, "hits": 1, "misses": 1, "coalesced": 2}
+        )
+
+    def test_failed_query_is_not_cached(self):
+        async def query():
+            raise ValueError("failed")
+
+        cache = QueryCache(60, 10)
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                asyncio.run(cache.get("key", query))
+        self.assertEqual(cache.stats()["misses"], 2)
+        self.assertEqual(cache.stats()["entries"], 0)
@@ -0,0 +1,35 @@
+import asyncio
+import unittest
+
+from backend.helpers.rest_helpers import read_lines
+
+
+class FakeStream:
+    def __init__(self, chunks: list) -> None:
+        self._chunks = chunks
+
+    async def iter_any(self):
+        for chunk in self._chunks:
+            yield chunk
+
+
+def collect(chunks: list, max_line: int) -> list:
+    async def run() -> list:
+        return [line async for line in read_lines(FakeStream(chunks), max_line)]
+
+    return asyncio.run(run())
+
+
+class TestReadLines(unittest.TestCase):
+    def test_lines_across_chunks(self):
+        lines = collect([b'{"a"', b": 1}\n\n{", b'"b": 2}\nlast'], 100)
+        self.assertEqual(lines, [b'{"a": 1}', b"", b'{"b": 2}', b"last"])
+
+    def test_long_lines_are_skipped(self):
+        lines = collect([b"12345\n123456", b"789\nok\n", b"1234567"], 5)
+        self.assertEqual(lines, [b"12345", None, b"ok", None])
+
+    def test_line_longer_than_stream_reader_limit(self):
+        line = b"x" * 200 * 1024
+        lines = collect([line[:70000], line[70000:] + b"\nok"], 1024 * 1024)
+        self.assertEqual(lines, [line, b"ok"])
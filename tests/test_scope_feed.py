@@ -0,0 +1,40 @@
+import asyncio
+import unittest
+
+import mock
+
+from backend.core.scope_feed import ScopeSubscriber
+
+
+async def drain(subscriber: ScopeSubscriber) -> list:
+    events = []
+    while not subscriber._queue.empty() or subscriber._overflow:
+        events.append(await subscriber.get())
+    return events
+
+
+class TestScopeSubscriber(unittest.TestCase):
+    @mock.patch("backend.core.scope_feed.SUBSCRIBER_QUEUE_SIZE", 3)
+    def test_overflow_event_is_delivered(self):
+        async def run() -> list:
+            subscriber = ScopeSubscriber()
+            for index in range(5):
+                subscriber.put({"name": f"n{index}"})
+            events = [await subscriber.get()]
+            subscriber.put({"name": "n5"})
+            return events + await drain(subscriber)
+
+        events = asyncio.run(run())
+        self.assertEqual(
+            [event.get("name", event.get("event")) for event in events],
+            ["n0", "n1", "n2", "overflow", "n5"],
+        )
+
+    def test_no_overflow(self):
+        async def run() -> list:
+            subscriber = ScopeSubscriber()
+            for index in range(3):
+                subscriber.put({"name": f"n{index}"})
+            return await drain(subscriber)
+
+        self.assertEqual([event["name"] for event in asyncio.run(run())], ["n0", "n1", "n2"])
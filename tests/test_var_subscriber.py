@@ -0,0 +1,48 @@
+import asyncio
+import unittest
+
+import mock
+
+from backend.core.var_subscriber import VarSubscription, VarSubscriptionHub
+
+
+class FakePubSub:
+    def __init__(self, hub: VarSubscriptionHub, fail: bool) -> None:
+        self.hub = hub
+        self.fail = fail
+        self.sent = False
+
+    def psubscribe(self, pattern: str) -> None:
+        if self.fail:
+            raise ConnectionError("connection lost")
+
+    def get_message(self, timeout: float):
+        if self.sent:
+            self.hub.stop()
+            return None
+        self.sent = True
+        return {"channel": b"__keyspace@0__:Var:fleet,ID:agv1@pose_goal,Value:", "data": b"del"}
+
+    def close(self) -> None:
+        pass
+
+
+class TestVarSubscriptionHub(unittest.TestCase):
+    @mock.patch("backend.core.var_subscriber.LISTEN_RETRY", 0)
+    def test_listener_restarts_after_failure(self):
+        async def run() -> list:
+            hub = VarSubscriptionHub()
+            pubsubs = [FakePubSub(hub, fail=True), FakePubSub(hub, fail=False)]
+            db = mock.MagicMock()
+            db.return_value.db_read.pubsub.side_effect = pubsubs
+            subscription = VarSubscription()
+            subscription.subscribe("fleet", ["*@pose_goal"])
+            with mock.patch("backend.core.var_subscriber.MovaiDB", db):
+                hub.register(subscription)
+                await asyncio.get_running_loop().run_in_executor(None, hub._thread.join, 1)
+            await asyncio.sleep(0)
+            return [subscription._queue.get_nowait() for _ in range(subscription._queue.qsize())]
+
+        changes = asyncio.run(run())
+        self.assertEqual([change["event"] for change in changes], ["error", "del"])
+        self.assertEqual(changes[1]["robot"], "agv1")
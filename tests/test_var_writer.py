@@ -0,0 +1,29 @@
+import unittest
+
+import mock
+
+from backend.core.var_writer import CoalescingVarWriter
+
+
+@mock.patch("backend.core.var_writer.write_vars")
+class TestCoalescingVarWriter(unittest.TestCase):
+    def test_only_the_coalesced_keys_are_queued(self, write_vars):
+        writer = CoalescingVarWriter(["pose_goal"], window=60)
+        self.assertFalse(writer.set("fleet", "agv1@startTime", 1))
+        self.assertTrue(writer.set("Fleet", "agv1@pose_goal", 1))
+        self.assertTrue(writer.set("fleet", "agv1@pose_goal", 2))
+        self.assertTrue(writer.set("fleet", "agv2@pose_goal", 3))
+        self.assertEqual(writer.pending, 2)
+        writer.flush()
+        write_vars.assert_called_once_with({"fleet": {"agv1@pose_goal": 2, "agv2@pose_goal": 3}})
+        self.assertEqual(writer.pending, 0)
+
+    def test_flush_cancels_the_window(self, write_vars):
+        writer = CoalescingVarWriter(["pose_goal"], window=60)
+        writer.set("fleet", "agv1@pose_goal", 1)
+        timer = writer._timer
+        writer.flush()
+        timer.join(1)
+        self.assertFalse(timer.is_alive())
+        self.assertIsNone(writer._timer)
+        self.assertEqual(write_vars.call_count, 1)